@@ -1,6 +1,10 @@
 import os
+import threading
+import urllib.parse
 import urllib.request
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor, wait
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from log_common import MicroCache, READ_CHUNK, TimeIndex, parse_time_bound, last_lines
 
 # File path for shared volume (between log-writer and log-reader)
 LOG_FILE = os.getenv("LOG_FILE", "/usr/src/app/files/log.txt")
@@ -17,25 +21,36 @@ INFO_FILE = os.getenv("INFO_FILE", "/usr/src/app/config/information.txt")
 # Message from env variable
 MESSAGE = os.getenv("MESSAGE", "")
 
+# /status calls PingPong and Greeter concurrently, each with UPSTREAM_TIMEOUT seconds, and waits at most
+# STATUS_BUDGET seconds overall; anything missing by then is served from its last known value
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "2"))
+STATUS_BUDGET = float(os.getenv("STATUS_BUDGET", "2.5"))
+
+# Upper bound for /status?lines=N
+MAX_LINES = 1000
+
+# Seconds the log tail and upstream values behind /status are reused (0 disables); under load only one
+# request per STATUS_CACHE_TTL reads the log and calls the upstream services, whatever its ?lines=
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "1"))
+
+# /logs: a sparse time index keeps one sample per TIME_INDEX_STRIDE bytes, so a range query reads
+# about one stride per bound instead of the whole log
+TIME_INDEX_STRIDE = int(os.getenv("TIME_INDEX_STRIDE", str(256 * 1024)))
+
 
 def get_pingpong_count():
     """Get ping-pong count via HTTP from PingPong service"""
-    try:
-        with urllib.request.urlopen(PINGPONG_URL, timeout=5) as response:
-            return int(response.read().decode().strip())
-    except Exception as e:
-        print(f"Error fetching pingpong count: {e}")
-        return 0
+    with urllib.request.urlopen(PINGPONG_URL, timeout=UPSTREAM_TIMEOUT) as response:
+        return int(response.read().decode().strip())
 
 
 def get_greeting():
     """Get greeting via HTTP from Greeter service"""
-    try:
-        with urllib.request.urlopen(GREETER_URL, timeout=5) as response:
-            return response.read().decode().strip()
-    except Exception as e:
-        print(f"Error fetching greeting: {e}")
-        return "Error fetching greeting"
+    with urllib.request.urlopen(GREETER_URL, timeout=UPSTREAM_TIMEOUT) as response:
+        return response.read().decode().strip()
+
+
+time_index = TimeIndex(LOG_FILE, TIME_INDEX_STRIDE)
 
 
 def read_info_file():
@@ -47,25 +62,111 @@ def read_info_file():
         return "file not found"
 
 
+class Upstream:
+    """Wraps a fetch and remembers its last good value, served when a later call fails or runs out of time"""
+
+    def __init__(self, name, fetch, fallback):
+        self.name = name
+        self.fetch = fetch
+        self._last = fallback
+        self._lock = threading.Lock()
+        self._pending = None
+
+    def submit(self, executor):
+        """Start a call on executor, or return None while the previous call is still running"""
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return None
+            self._pending = executor.submit(self.call)
+            return self._pending
+
+    def call(self):
+        value = self.fetch()
+        with self._lock:
+            self._last = value
+        return value
+
+    def last_known(self):
+        with self._lock:
+            return self._last
+
+
+UPSTREAMS = {
+    "pingpong_count": Upstream("pingpong count", get_pingpong_count, 0),
+    "file_content": Upstream("information.txt", read_info_file, "file not found"),
+    "greeting": Upstream("greeting", get_greeting, "Error fetching greeting"),
+}
+upstream_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="upstream")
+
+
+def gather_upstreams():
+    """Call every upstream at once, so /status takes as long as the slowest one rather than their sum"""
+    futures = {}
+    for key, upstream in UPSTREAMS.items():
+        future = upstream.submit(upstream_executor)
+        if future is not None:
+            futures[key] = future
+    done, not_done = wait(futures.values(), timeout=STATUS_BUDGET)
+    # Calls that have not started yet would only queue up behind a slow upstream
+    for future in not_done:
+        future.cancel()
+    results = {}
+    for key, upstream in UPSTREAMS.items():
+        future = futures.get(key)
+        if future in done and future.exception() is None:
+            results[key] = future.result()
+            continue
+        if future is None:
+            reason = "previous call still running"
+        else:
+            reason = future.exception() if future in done else f"no answer within {STATUS_BUDGET}s"
+        print(f"Error fetching {upstream.name}: {reason}; using last known value")
+        results[key] = upstream.last_known()
+    return results
+
+
+def read_status_snapshot():
+    """Read the last MAX_LINES log lines and the upstream values; every /status?lines=N is served from this"""
+    lines = last_lines(LOG_FILE, MAX_LINES)
+    if not lines:
+        raise FileNotFoundError(LOG_FILE)
+    snapshot = gather_upstreams()
+    snapshot["lines"] = lines
+    return snapshot
+
+
+def build_status(snapshot, count):
+    """Format the /status response from the last `count` lines of a snapshot"""
+    log_content = "\n".join(line.strip() for line in snapshot["lines"][-count:])
+
+    # Format output with file content, env variable, timestamp, pings, and greeting
+    response = f"file content: {snapshot['file_content']}\n"
+    response += f"env variable: MESSAGE={MESSAGE}\n"
+    response += f"{log_content}\n"
+    response += f"Ping / Pongs: {snapshot['pingpong_count']}\n"
+    response += f"greetings: {snapshot['greeting']}"
+    return response
+
+
+status_cache = MicroCache(STATUS_CACHE_TTL)
+
+
+class LogServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 refuses connections during bursts
+    request_queue_size = 128
+
+
 class LogHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        if self.path == "/" or self.path == "/status":
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/" or url.path == "/status":
             try:
-                with open(LOG_FILE, "r") as f:
-                    # read last line
-                    log_content = f.readlines()[-1].strip()
-                
-                pingpong_count = get_pingpong_count()
-                file_content = read_info_file()
-                greeting = get_greeting()
-                
-                # Format output with file content, env variable, timestamp, pings, and greeting
-                response = f"file content: {file_content}\n"
-                response += f"env variable: MESSAGE={MESSAGE}\n"
-                response += f"{log_content}\n"
-                response += f"Ping / Pongs: {pingpong_count}\n"
-                response += f"greetings: {greeting}"
-                
+                try:
+                    count = int(urllib.parse.parse_qs(url.query).get("lines", ["1"])[0])
+                except ValueError:
+                    count = 1
+                count = min(max(count, 1), MAX_LINES)
+                response = build_status(status_cache.get("status", read_status_snapshot), count)
                 self.send_response(200)
                 self.send_header("Content-Type", "text/plain")
                 self.end_headers()
@@ -75,7 +176,39 @@ class LogHandler(BaseHTTPRequestHandler):
                 self.send_header("Content-Type", "text/plain")
                 self.end_headers()
                 self.wfile.write(b"Log file not ready yet")
-        elif self.path == "/healthz":
+        elif url.path == "/logs":
+            # Entries with from <= timestamp < to (ISO 8601); either bound may be left out
+            query = urllib.parse.parse_qs(url.query)
+            try:
+                start = parse_time_bound(query["from"][0]) if "from" in query else None
+                end = parse_time_bound(query["to"][0]) if "to" in query else None
+            except ValueError as e:
+                self.send_response(400)
+                self.send_header("Content-Type", "text/plain")
+                self.end_headers()
+                self.wfile.write(f"Invalid timestamp: {e}".encode())
+                return
+            try:
+                low, high = time_index.byte_range(start, end)
+                with open(LOG_FILE, "rb") as f:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain")
+                    self.send_header("Content-Length", str(high - low))
+                    self.end_headers()
+                    f.seek(low)
+                    remaining = high - low
+                    while remaining > 0:
+                        block = f.read(min(READ_CHUNK, remaining))
+                        if not block:
+                            break
+                        self.wfile.write(block)
+                        remaining -= len(block)
+            except FileNotFoundError:
+                self.send_response(503)
+                self.send_header("Content-Type", "text/plain")
+                self.end_headers()
+                self.wfile.write(b"Log file not ready yet")
+        elif url.path == "/healthz":
             # Readiness probe - checks connectivity to PingPong and Greeter services
             try:
                 with urllib.request.urlopen(PINGPONG_URL, timeout=5) as response:
@@ -103,6 +236,6 @@ class LogHandler(BaseHTTPRequestHandler):
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 3000))
     print(f"Log Reader server started in port {port}")
-    server = HTTPServer(("0.0.0.0", port), LogHandler)
+    server = LogServer(("0.0.0.0", port), LogHandler)
     server.serve_forever()
 
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Per-pod throughput benchmark for the Knative PingPong service.
+
+Starts main.py locally once for each --workers value, drives /pingpong at
+Knative's target concurrency and prints requests/second and latency
+percentiles for each run. The server uses the usual DB_* environment
+variables, so point them at a local Postgres first:
+
+    DB_HOST=localhost python bench.py --workers 1,4,8 --concurrency 100 --duration 10
+
+To measure an already running instance instead:
+
+    python bench.py --url http://localhost:8080/pingpong --concurrency 100
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+# Knative's default autoscaling.knative.dev/target (soft concurrency per pod)
+KNATIVE_TARGET_CONCURRENCY = 100
+
+# main.py imports observability.py from PingPong/; the Dockerfile copies it into the image
+SHARED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "PingPong")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(url, concurrency, duration, timeout=10):
+    """Hit url from `concurrency` threads for `duration` seconds and collect latencies"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        local_latencies = []
+        local_errors = 0
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as response:
+                    response.read()
+                local_latencies.append(time.monotonic() - started)
+            except Exception:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read()
+            return True
+        except Exception:
+            time.sleep(0.1)
+    return False
+
+
+def start_server(port, workers):
+    env = dict(os.environ, PORT=str(port), SERVER_WORKERS=str(workers), PYTHONPATH=SHARED_DIR)
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    return subprocess.Popen([sys.executable, "-u", main_py], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+
+def print_result(label, result):
+    print(f"{label:<14} {result['rps']:>10.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+          f"{result['p99_ms']:>9.2f} {result['requests']:>9} {result['errors']:>7}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Knative PingPong throughput per pod")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting main.py")
+    parser.add_argument("--workers", default="1,8", help="Comma-separated SERVER_WORKERS values to compare")
+    parser.add_argument("--concurrency", type=int, default=KNATIVE_TARGET_CONCURRENCY)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--path", default="/pingpong")
+    args = parser.parse_args()
+
+    print(f"concurrency={args.concurrency} duration={args.duration}s", flush=True)
+    print(f"{'run':<14} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'requests':>9} {'errors':>7}", flush=True)
+
+    if args.url:
+        run_load(args.url, args.concurrency, args.warmup)
+        print_result("external", run_load(args.url, args.concurrency, args.duration))
+        return
+
+    url = f"http://127.0.0.1:{args.port}{args.path}"
+    for workers in [int(w) for w in args.workers.split(",")]:
+        server = start_server(args.port, workers)
+        try:
+            if not wait_until_up(f"http://127.0.0.1:{args.port}/health"):
+                print(f"workers={workers}: server did not start", flush=True)
+                continue
+            run_load(url, args.concurrency, args.warmup)
+            print_result(f"workers={workers}", run_load(url, args.concurrency, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import os
+import queue
+import threading
 import time
-import psycopg2
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from observability import HealthChecker, Metrics, connection_check
 
 # Database configuration
 DB_HOST = os.getenv("DB_HOST", "postgres-svc")
@@ -9,23 +11,55 @@ DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "pingpong")
 DB_USER = os.getenv("DB_USER", "pingpong")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "pingpong")
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+# Health checks run in the background every HEALTH_CHECK_INTERVAL seconds;
+# probes report unready once the last check is older than HEALTH_MAX_AGE
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))
+HEALTH_MAX_AGE = float(os.getenv("HEALTH_MAX_AGE", "15"))
+
+# Requests are handled on SERVER_WORKERS threads, each with its own database connection;
+# 1 keeps the single-threaded server. Pods x (SERVER_WORKERS + 1) must stay below Postgres'
+# max_connections, see knative-service.yaml.
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "8"))
+# Pending connections the listening socket queues while all workers are busy and the hand-off queue is full
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "128"))
+
+# The port binds before the schema exists; requests wait up to SCHEMA_WAIT_TIMEOUT seconds for it
+SCHEMA_WAIT_TIMEOUT = float(os.getenv("SCHEMA_WAIT_TIMEOUT", "10"))
+schema_ready = threading.Event()
+
+
+metrics = Metrics()
+metrics.describe("pingpong_http_requests_total", "counter", "HTTP requests by endpoint, method and status")
+metrics.describe("pingpong_http_request_duration_seconds", "histogram", "HTTP request latency by endpoint")
+metrics.describe("pingpong_db_phase_duration_seconds", "histogram", "Database time by phase (connect, query, commit)")
+metrics.describe("pingpong_db_connect_retries_total", "counter", "Retries in init_db after a failed database attempt")
+metrics.inc("pingpong_db_connect_retries_total", 0)
+
+# Paths reported as their own endpoint label; anything else is "unmatched"
+METRIC_ENDPOINTS = {"/", "/pingpong", "/health", "/healthz", "/pings", "/metrics"}
 
 
 def get_db_connection():
     """Get database connection"""
-    return psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
+    # Imported on first use so the server can bind its port without waiting for it
+    import psycopg2
+    with metrics.timer("pingpong_db_phase_duration_seconds", phase="connect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            connect_timeout=DB_CONNECT_TIMEOUT
+        )
 
 
 def init_db():
-    """Initialize database table"""
-    retries = 10
-    while retries > 0:
+    """Initialize database table, retrying with backoff until the database is reachable"""
+    delay = 0.1
+    while True:
         try:
             conn = get_db_connection()
             cur = conn.cursor()
@@ -42,75 +76,154 @@ def init_db():
             conn.commit()
             cur.close()
             conn.close()
+            schema_ready.set()
             print("Database initialized successfully")
             return
         except Exception as e:
-            print(f"Database connection failed, retrying... ({e})")
-            retries -= 1
-            time.sleep(2)
-    print("Failed to initialize database")
+            metrics.inc("pingpong_db_connect_retries_total")
+            print(f"Database connection failed, retrying in {delay:.1f}s... ({e})")
+            time.sleep(delay)
+            delay = min(delay * 2, 2)
+
+
+def wait_for_schema():
+    if not schema_ready.wait(SCHEMA_WAIT_TIMEOUT):
+        raise RuntimeError("database schema is not initialized yet")
+
+
+_worker = threading.local()
+
+
+def get_worker_connection():
+    """Get the calling worker thread's persistent database connection"""
+    conn = getattr(_worker, "conn", None)
+    if conn is None or conn.closed:
+        conn = get_db_connection()
+        _worker.conn = conn
+    return conn
+
+
+def reset_worker_connection():
+    """Drop the worker's connection after an error so the next request reconnects"""
+    conn = getattr(_worker, "conn", None)
+    _worker.conn = None
+    if conn is not None and not conn.closed:
+        conn.close()
 
 
 def get_counter():
     """Get current counter value from database"""
     try:
-        conn = get_db_connection()
+        wait_for_schema()
+        conn = get_worker_connection()
         cur = conn.cursor()
-        cur.execute("SELECT count FROM counter WHERE id = 1")
+        with metrics.timer("pingpong_db_phase_duration_seconds", phase="query"):
+            cur.execute("SELECT count FROM counter WHERE id = 1")
         result = cur.fetchone()
         cur.close()
-        conn.close()
+        conn.rollback()
         return result[0] if result else 0
     except Exception as e:
         print(f"Error getting counter: {e}")
+        reset_worker_connection()
         return 0
 
 
 def increment_counter():
-    """Increment counter in database and return new value"""
+    """Increment counter in database and return the value it had before"""
     try:
-        conn = get_db_connection()
+        wait_for_schema()
+        conn = get_worker_connection()
         cur = conn.cursor()
-        cur.execute("UPDATE counter SET count = count + 1 WHERE id = 1 RETURNING count")
+        # One statement on the worker's connection: the row lock makes read-and-increment atomic
+        with metrics.timer("pingpong_db_phase_duration_seconds", phase="query"):
+            cur.execute("UPDATE counter SET count = count + 1 WHERE id = 1 RETURNING count - 1")
         result = cur.fetchone()
-        conn.commit()
+        with metrics.timer("pingpong_db_phase_duration_seconds", phase="commit"):
+            conn.commit()
         cur.close()
-        conn.close()
         return result[0] if result else 0
     except Exception as e:
         print(f"Error incrementing counter: {e}")
+        reset_worker_connection()
         return 0
 
 
+health_checker = HealthChecker(connection_check(get_db_connection), HEALTH_CHECK_INTERVAL, HEALTH_MAX_AGE)
+
+
+class WorkerPoolHTTPServer(HTTPServer):
+    """HTTPServer that handles requests on a fixed pool of worker threads"""
+
+    request_queue_size = SERVER_BACKLOG
+
+    def __init__(self, server_address, handler_class, workers):
+        super().__init__(server_address, handler_class)
+        # A plain queue and threads rather than concurrent.futures, which adds ~15ms of imports to cold start.
+        # The queue is bounded so that, once it is full, the accept loop blocks and bursts wait in the listen backlog.
+        self._requests = queue.Queue(maxsize=workers)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        self._requests.put((request, client_address))
+
+    def _work(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        for _ in self._workers:
+            self._requests.put(None)
+        for worker in self._workers:
+            worker.join()
+
+
 class PingPongHandler(BaseHTTPRequestHandler):
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
     def do_GET(self):
+        started = time.perf_counter()
+        self._status = 500
+        try:
+            self.handle_get()
+        finally:
+            endpoint = self.path if self.path in METRIC_ENDPOINTS else "unmatched"
+            metrics.inc("pingpong_http_requests_total", endpoint=endpoint, method="GET", status=self._status)
+            metrics.observe("pingpong_http_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+
+    def handle_get(self):
         if self.path == "/" or self.path == "/pingpong":
-            # Main pingpong endpoint
-            counter = get_counter()
+            # Main pingpong endpoint - reports the count before this ping
+            counter = increment_counter()
             response = f"pong {counter}"
-            increment_counter()
             self.send_response(200)
             self.send_header("Content-Type", "text/plain")
             self.end_headers()
             self.wfile.write(response.encode())
         elif self.path == "/health" or self.path == "/healthz":
-            # Health check endpoint - checks database connectivity
-            try:
-                conn = get_db_connection()
-                cur = conn.cursor()
-                cur.execute("SELECT 1")
-                cur.close()
-                conn.close()
-                self.send_response(200)
-                self.send_header("Content-Type", "text/plain")
-                self.end_headers()
-                self.wfile.write(b"ok")
-            except Exception as e:
-                print(f"Health check failed: {e}")
-                self.send_response(500)
-                self.send_header("Content-Type", "text/plain")
-                self.end_headers()
-                self.wfile.write(f"Database connection failed: {e}".encode())
+            # Health check endpoint - answers from the background database check
+            healthy, message = health_checker.status_text()
+            self.send_response(200 if healthy else 500)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(message.encode())
         elif self.path == "/pings":
             # Endpoint for LogOutput to get the current count
             counter = get_counter()
@@ -118,6 +231,12 @@ class PingPongHandler(BaseHTTPRequestHandler):
             self.send_header("Content-Type", "text/plain")
             self.end_headers()
             self.wfile.write(str(counter).encode())
+        elif self.path == "/metrics":
+            # Prometheus scrape endpoint
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.end_headers()
+            self.wfile.write(metrics.render().encode())
         else:
             self.send_response(404)
             self.end_headers()
@@ -127,10 +246,16 @@ class PingPongHandler(BaseHTTPRequestHandler):
 
 
 if __name__ == "__main__":
-    init_db()
     # Knative requires PORT environment variable, default to 8080
     port = int(os.getenv("PORT", 8080))
-    print(f"Server started in port {port}")
-    server = HTTPServer(("0.0.0.0", port), PingPongHandler)
+    # Bind before touching the database so scale-from-zero requests can connect right away
+    if SERVER_WORKERS > 1:
+        server = WorkerPoolHTTPServer(("0.0.0.0", port), PingPongHandler, SERVER_WORKERS)
+        print(f"Server started in port {port} with {SERVER_WORKERS} workers")
+    else:
+        server = HTTPServer(("0.0.0.0", port), PingPongHandler)
+        print(f"Server started in port {port}")
+    threading.Thread(target=init_db, name="init-db", daemon=True).start()
+    health_checker.start()
     server.serve_forever()
 
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the Knative PingPong service.
+
+Starts main.py repeatedly against a local Postgres and measures, from
+process spawn:
+  - time until the port accepts connections
+  - time until /pingpong returns the correct count
+
+The server uses the usual DB_* environment variables:
+
+    DB_HOST=localhost python startup_bench.py --runs 10
+    DB_HOST=localhost python startup_bench.py --runs 10 --fresh-schema
+    DB_HOST=localhost python startup_bench.py --main /tmp/old_main.py
+
+--fresh-schema drops the counter table before every run to include schema
+creation; --main compares another version of the service.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import psycopg2
+
+# main.py imports observability.py from PingPong/; the Dockerfile copies it into the image
+SHARED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "PingPong")
+
+
+def db_connect():
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST", "postgres-svc"),
+        port=os.getenv("DB_PORT", "5432"),
+        dbname=os.getenv("DB_NAME", "pingpong"),
+        user=os.getenv("DB_USER", "pingpong"),
+        password=os.getenv("DB_PASSWORD", "pingpong"),
+    )
+
+
+def current_count(drop_table):
+    """Return the count the next /pingpong should report, optionally resetting the schema"""
+    conn = db_connect()
+    cur = conn.cursor()
+    if drop_table:
+        cur.execute("DROP TABLE IF EXISTS counter")
+        conn.commit()
+        count = 0
+    else:
+        cur.execute("SELECT to_regclass('counter') IS NOT NULL")
+        if cur.fetchone()[0]:
+            cur.execute("SELECT count FROM counter WHERE id = 1")
+            row = cur.fetchone()
+            count = row[0] if row else 0
+        else:
+            count = 0
+    cur.close()
+    conn.close()
+    return count
+
+
+def port_open(port):
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.05):
+            return True
+    except OSError:
+        return False
+
+
+def measure(main_py, port, expected, timeout):
+    env = dict(os.environ, PORT=str(port), PYTHONPATH=SHARED_DIR)
+    started = time.monotonic()
+    process = subprocess.Popen([sys.executable, "-u", main_py], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    bound_at = None
+    try:
+        while time.monotonic() - started < timeout:
+            if bound_at is None:
+                if not port_open(port):
+                    time.sleep(0.001)
+                    continue
+                bound_at = time.monotonic() - started
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/pingpong", timeout=timeout) as response:
+                    body = response.read().decode()
+                if body == f"pong {expected}":
+                    return bound_at, time.monotonic() - started
+            except Exception:
+                pass
+            time.sleep(0.001)
+        return bound_at, None
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(label, values):
+    values = [v * 1000 for v in values if v is not None]
+    if not values:
+        print(f"{label:<22} no successful runs")
+        return
+    print(f"{label:<22} min {min(values):8.1f} ms  median {statistics.median(values):8.1f} ms  max {max(values):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Knative PingPong time-to-first-successful-response")
+    parser.add_argument("--main", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=18081)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--fresh-schema", action="store_true", help="Drop the counter table before every run")
+    args = parser.parse_args()
+
+    bound, first_ok = [], []
+    for run in range(1, args.runs + 1):
+        expected = current_count(args.fresh_schema)
+        bound_at, ok_at = measure(args.main, args.port, expected, args.timeout)
+        bound.append(bound_at)
+        first_ok.append(ok_at)
+        print(f"run {run}: port open {bound_at * 1000 if bound_at else float('nan'):.1f} ms, "
+              f"first pong {ok_at * 1000 if ok_at else float('nan'):.1f} ms", flush=True)
+
+    summarize("port open", bound)
+    summarize("first successful pong", first_ok)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Append throughput benchmark for the LogOutput writer.
+
+Writes --lines log entries as fast as possible into a temporary file and prints
+lines/second for the old open-append-close per line approach and for the
+Appender (log_common.py) under each fsync policy:
+
+    python append_bench.py --lines 100000
+    python append_bench.py --lines 20000 --batch-lines 500 --dir /shared
+
+--dir selects the filesystem to measure; fsync cost depends heavily on it.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from log_common import Appender, FSYNC_POLICIES
+
+LINE = "2026-01-01T00:00:00.000Z: AbCdEfGhIjKlMnOp.\nPing / Pongs: 12345\n"
+
+
+def reopen_per_line(path, lines):
+    for _ in range(lines):
+        with open(path, "a") as f:
+            f.write(LINE)
+            f.flush()
+
+
+def appender(policy, args):
+    def run(path, lines):
+        log = Appender(path, fsync=policy, batch_lines=args.batch_lines, batch_delay_ms=args.batch_delay_ms,
+                       fsync_interval=args.fsync_interval)
+        for _ in range(lines):
+            log.write(LINE)
+        # Closing flushes and syncs what is left, so it is part of the measurement
+        log.close()
+        return log
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LogOutput log appends per fsync policy")
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--batch-lines", type=int, default=100)
+    parser.add_argument("--batch-delay-ms", type=float, default=200)
+    parser.add_argument("--fsync-interval", type=float, default=1)
+    parser.add_argument("--dir", default=None, help="Directory for the scratch log (default: system temp)")
+    args = parser.parse_args()
+
+    runs = [("reopen per line", reopen_per_line)]
+    runs += [(f"appender fsync={policy}", appender(policy, args)) for policy in FSYNC_POLICIES]
+
+    print(f"lines={args.lines} batch_lines={args.batch_lines} batch_delay_ms={args.batch_delay_ms} "
+          f"fsync_interval={args.fsync_interval}s", flush=True)
+    print(f"{'mode':<24} {'lines/s':>12} {'seconds':>9} {'batches':>8} {'fsyncs':>7}", flush=True)
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for label, run in runs:
+            path = os.path.join(directory, "log.txt")
+            started = time.perf_counter()
+            result = run(path, args.lines)
+            elapsed = time.perf_counter() - started
+            expected = args.lines * len(LINE.encode())
+            if os.path.getsize(path) != expected:
+                print(f"{label}: wrote {os.path.getsize(path)} bytes, expected {expected}", flush=True)
+            batches = getattr(result, "batches", "-")
+            syncs = getattr(result, "syncs", "-")
+            print(f"{label:<24} {args.lines / elapsed:>12.0f} {elapsed:>9.3f} {batches:>8} {syncs:>7}", flush=True)
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import os
+import urllib.parse
 import urllib.request
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from log_common import MicroCache, READ_CHUNK, TimeIndex, parse_time_bound, last_lines
 
 # File path for shared volume (between log-writer and log-reader)
 LOG_FILE = os.getenv("LOG_FILE", "/usr/src/app/files/log.txt")
@@ -14,6 +16,17 @@ INFO_FILE = os.getenv("INFO_FILE", "/usr/src/app/config/information.txt")
 # Message from env variable
 MESSAGE = os.getenv("MESSAGE", "")
 
+# Upper bound for /status?lines=N
+MAX_LINES = 1000
+
+# Seconds the log tail and upstream values behind /status are reused (0 disables); under load only one
+# request per STATUS_CACHE_TTL reads the log and calls the upstream services, whatever its ?lines=
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "1"))
+
+# /logs: a sparse time index keeps one sample per TIME_INDEX_STRIDE bytes, so a range query reads
+# about one stride per bound instead of the whole log
+TIME_INDEX_STRIDE = int(os.getenv("TIME_INDEX_STRIDE", str(256 * 1024)))
+
 
 def get_pingpong_count():
     """Get ping-pong count via HTTP from PingPong service"""
@@ -25,6 +38,9 @@ def get_pingpong_count():
         return 0
 
 
+time_index = TimeIndex(LOG_FILE, TIME_INDEX_STRIDE)
+
+
 def read_info_file():
     """Read content from information.txt"""
     try:
@@ -34,23 +50,47 @@ def read_info_file():
         return "file not found"
 
 
+def read_status_snapshot():
+    """Read the last MAX_LINES log lines and the upstream values; every /status?lines=N is served from this"""
+    lines = last_lines(LOG_FILE, MAX_LINES)
+    if not lines:
+        raise FileNotFoundError(LOG_FILE)
+    snapshot = {"pingpong_count": get_pingpong_count(), "file_content": read_info_file()}
+    snapshot["lines"] = lines
+    return snapshot
+
+
+def build_status(snapshot, count):
+    """Format the /status response from the last `count` lines of a snapshot"""
+    log_content = "\n".join(line.strip() for line in snapshot["lines"][-count:])
+
+    # Format output with file content, env variable, timestamp and pings
+    response = f"file content: {snapshot['file_content']}\n"
+    response += f"env variable: MESSAGE={MESSAGE}\n"
+    response += f"{log_content}\n"
+    response += f"Ping / Pongs: {snapshot['pingpong_count']}"
+    return response
+
+
+status_cache = MicroCache(STATUS_CACHE_TTL)
+
+
+class LogServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 refuses connections during bursts
+    request_queue_size = 128
+
+
 class LogHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        if self.path == "/" or self.path == "/status":
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/" or url.path == "/status":
             try:
-                with open(LOG_FILE, "r") as f:
-                    # read last line
-                    log_content = f.readlines()[-1].strip()
-                
-                pingpong_count = get_pingpong_count()
-                file_content = read_info_file()
-                
-                # Format output with file content, env variable, timestamp and pings
-                response = f"file content: {file_content}\n"
-                response += f"env variable: MESSAGE={MESSAGE}\n"
-                response += f"{log_content}\n"
-                response += f"Ping / Pongs: {pingpong_count}"
-                
+                try:
+                    count = int(urllib.parse.parse_qs(url.query).get("lines", ["1"])[0])
+                except ValueError:
+                    count = 1
+                count = min(max(count, 1), MAX_LINES)
+                response = build_status(status_cache.get("status", read_status_snapshot), count)
                 self.send_response(200)
                 self.send_header("Content-Type", "text/plain")
                 self.end_headers()
@@ -60,7 +100,39 @@ class LogHandler(BaseHTTPRequestHandler):
                 self.send_header("Content-Type", "text/plain")
                 self.end_headers()
                 self.wfile.write(b"Log file not ready yet")
-        elif self.path == "/healthz":
+        elif url.path == "/logs":
+            # Entries with from <= timestamp < to (ISO 8601); either bound may be left out
+            query = urllib.parse.parse_qs(url.query)
+            try:
+                start = parse_time_bound(query["from"][0]) if "from" in query else None
+                end = parse_time_bound(query["to"][0]) if "to" in query else None
+            except ValueError as e:
+                self.send_response(400)
+                self.send_header("Content-Type", "text/plain")
+                self.end_headers()
+                self.wfile.write(f"Invalid timestamp: {e}".encode())
+                return
+            try:
+                low, high = time_index.byte_range(start, end)
+                with open(LOG_FILE, "rb") as f:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain")
+                    self.send_header("Content-Length", str(high - low))
+                    self.end_headers()
+                    f.seek(low)
+                    remaining = high - low
+                    while remaining > 0:
+                        block = f.read(min(READ_CHUNK, remaining))
+                        if not block:
+                            break
+                        self.wfile.write(block)
+                        remaining -= len(block)
+            except FileNotFoundError:
+                self.send_response(503)
+                self.send_header("Content-Type", "text/plain")
+                self.end_headers()
+                self.wfile.write(b"Log file not ready yet")
+        elif url.path == "/healthz":
             # Readiness probe - checks connectivity to PingPong service
             try:
                 with urllib.request.urlopen(PINGPONG_URL, timeout=5) as response:
@@ -86,5 +158,5 @@ class LogHandler(BaseHTTPRequestHandler):
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 3000))
     print(f"Log Reader server started in port {port}")
-    server = HTTPServer(("0.0.0.0", port), LogHandler)
+    server = LogServer(("0.0.0.0", port), LogHandler)
     server.serve_forever()
\ No newline at end of file
@@ -1,13 +1,25 @@
 import uuid
 import os
+import signal
 import time
 from datetime import datetime, timezone
+from log_common import Appender
 
 # Generate random string on startup
 random_string = str(uuid.uuid4())
 
 # File path for shared volume
 LOG_FILE = os.getenv("LOG_FILE", "/usr/src/app/files/log.txt")
+# Seconds between log lines
+LOG_INTERVAL = float(os.getenv("LOG_INTERVAL", "5"))
+# The log stays open and entries are written in batches of up to LOG_BATCH_LINES lines, at most
+# LOG_BATCH_DELAY_MS after the first one was appended
+LOG_BATCH_LINES = int(os.getenv("LOG_BATCH_LINES", "100"))
+LOG_BATCH_DELAY_MS = float(os.getenv("LOG_BATCH_DELAY_MS", "200"))
+# Durability: "none" leaves syncing to the OS, "interval" fsyncs every LOG_FSYNC_INTERVAL seconds
+# while there is unsynced data, "batch" fsyncs after every batch
+LOG_FSYNC = os.getenv("LOG_FSYNC", "interval").lower()
+LOG_FSYNC_INTERVAL = float(os.getenv("LOG_FSYNC_INTERVAL", "1"))
 
 
 def get_timestamp():
@@ -15,16 +27,26 @@ def get_timestamp():
     return now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
 
 
+def handle_sigterm(signum, frame):
+    """Turn SIGTERM into SystemExit so pending lines are flushed on the way out"""
+    raise SystemExit(0)
+
+
 if __name__ == "__main__":
     print(f"Log Writer started. Random string: {random_string}")
-    
-    while True:
-        log_line = f"{get_timestamp()}: {random_string}\n"
-        print(log_line)
-        
-        # Append to shared file
-        with open(LOG_FILE, "a") as f:
-            f.write(log_line)
-        
-        time.sleep(5)
+
+    # Append to shared file, kept open for the life of the process
+    appender = Appender(LOG_FILE, fsync=LOG_FSYNC, batch_lines=LOG_BATCH_LINES, batch_delay_ms=LOG_BATCH_DELAY_MS,
+                        fsync_interval=LOG_FSYNC_INTERVAL)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    try:
+        while True:
+            log_line = f"{get_timestamp()}: {random_string}\n"
+            print(log_line)
+            appender.write(log_line)
+            time.sleep(LOG_INTERVAL)
+    finally:
+        appender.close()
+        print("Log flushed, exiting", flush=True)
 
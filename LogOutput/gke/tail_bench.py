@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Last-line lookup benchmark for the log_reader services.
+
+Generates a log of --size-gb gigabytes (or uses --log) and compares the old
+f.readlines()[-1] lookup with last_lines() from LogOutput/log_common.py, which
+both log readers use, reporting latency and the peak RSS of a fresh process
+doing the lookup:
+
+    python tail_bench.py --size-gb 2
+    python tail_bench.py --log /usr/src/app/files/log.txt --lines 100
+    python tail_bench.py --size-gb 8 --skip-readlines
+
+readlines() needs memory in proportion to the log, so skip it for logs larger
+than the machine's RAM.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+# last_lines() is shared with the readers from LogOutput/log_common.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from log_common import last_lines
+
+LINE = "2026-01-01T00:00:00.000Z: 6f1c2a44-9b7e-4d1e-a0c3-5c2b8f7e9d10\n"
+
+
+def generate(path, size_gb):
+    """Write about size_gb GiB of log lines to path"""
+    block = (LINE * (1024 * 1024 // len(LINE))).encode()
+    target = int(size_gb * 1024 ** 3)
+    with open(path, "wb") as f:
+        written = 0
+        while written < target:
+            f.write(block)
+            written += len(block)
+    return written
+
+
+def readlines_lookup(path, lines):
+    with open(path, "r") as f:
+        return f.readlines()[-lines:]
+
+
+def mmap_lookup(path, lines):
+    return last_lines(path, lines)
+
+
+def measure(method, log_path, lines, repeat, results):
+    """Run in a fresh process so ru_maxrss reflects this method alone"""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        method(log_path, lines)
+        timings.append(time.perf_counter() - started)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((timings, baseline, peak))
+
+
+def run(label, method, args, log_path):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=measure, args=(method, log_path, args.lines, args.repeat, results))
+    process.start()
+    timings, baseline, peak = results.get()
+    process.join()
+    # ru_maxrss is in KiB on Linux
+    print(f"{label:<16} {statistics.median(timings) * 1000:>12.3f} {max(timings) * 1000:>12.3f} "
+          f"{peak / 1024:>12.1f} {(peak - baseline) / 1024:>12.1f}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark last-line lookups on large logs")
+    parser.add_argument("--size-gb", type=float, default=2)
+    parser.add_argument("--log", help="Use an existing log instead of generating one")
+    parser.add_argument("--lines", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dir", default=None, help="Directory for the generated log (default: system temp)")
+    parser.add_argument("--skip-readlines", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        log_path = args.log
+        if log_path is None:
+            log_path = os.path.join(directory, "log.txt")
+            started = time.perf_counter()
+            generate(log_path, args.size_gb)
+            print(f"generated {os.path.getsize(log_path) / 1024 ** 3:.2f} GiB in {time.perf_counter() - started:.1f}s", flush=True)
+        print(f"log={log_path} size={os.path.getsize(log_path) / 1024 ** 3:.2f} GiB lines={args.lines} repeat={args.repeat}", flush=True)
+        print(f"{'method':<16} {'median ms':>12} {'max ms':>12} {'peak RSS MiB':>12} {'+RSS MiB':>12}", flush=True)
+        run("mmap last_lines", mmap_lookup, args, log_path)
+        if not args.skip_readlines:
+            run("readlines()", readlines_lookup, args, log_path)
+
+
+if __name__ == "__main__":
+    main()
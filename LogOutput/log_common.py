@@ -0,0 +1,281 @@
+"""
+Log file helpers and the /status microcache shared by the LogOutput services.
+writer.py and reader.py import it from this directory; the gke and Istio images
+copy it in from here (see their Dockerfiles and "Building the images" in the README).
+"""
+
+import bisect
+import mmap
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+# "none" leaves syncing to the OS, "interval" fsyncs every fsync_interval seconds while there is
+# unsynced data, "batch" fsyncs after every batch
+FSYNC_POLICIES = ("none", "interval", "batch")
+
+# Time indexes: bytes read after a stride boundary to find the next entry's timestamp, and the block
+# size for scanning forward from a sample
+TIME_INDEX_WINDOW = 64 * 1024
+READ_CHUNK = 64 * 1024
+# Lines starting with "<timestamp>: " open a log entry
+TIMESTAMP_LINE = re.compile(rb"(\d{4}-\d\d-\d\dT[\d:.]+Z): ")
+
+
+class Appender:
+    """Keeps a file open and writes appended entries in batches, syncing them according to a fsync policy"""
+
+    def __init__(self, path, fsync="interval", batch_lines=100, batch_delay_ms=200, fsync_interval=1):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync policy must be one of {', '.join(FSYNC_POLICIES)}, got {fsync!r}")
+        self.path = path
+        self.fsync = fsync
+        self.batch_lines = max(1, batch_lines)
+        self.batch_delay = batch_delay_ms / 1000
+        self.fsync_interval = fsync_interval
+        self._cond = threading.Condition()
+        self._file = open(path, "ab")
+        self._pending = []
+        self._pending_since = None
+        self._unsynced = False
+        self._last_sync = time.monotonic()
+        self._closed = False
+        self.batches = 0
+        self.syncs = 0
+        self._thread = threading.Thread(target=self._run, name="log-appender", daemon=True)
+        self._thread.start()
+
+    def write(self, text):
+        with self._cond:
+            if self._closed:
+                raise ValueError("write to closed appender")
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(text.encode())
+            if len(self._pending) >= self.batch_lines:
+                self._flush_locked()
+            else:
+                self._cond.notify()
+
+    def flush(self, sync=False):
+        """Write pending entries now, and fsync them if sync is set"""
+        with self._cond:
+            self._flush_locked(sync)
+
+    def reopen(self):
+        """Flush into the current file and continue in a new file at the same path, e.g. after a rename"""
+        with self._cond:
+            self._flush_locked(self.fsync != "none")
+            self._file.close()
+            self._file = open(self.path, "ab")
+
+    def close(self):
+        """Flush and sync everything and stop the background flusher"""
+        with self._cond:
+            if self._closed:
+                return
+            self._flush_locked(self.fsync != "none")
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self._file.close()
+
+    def _flush_locked(self, sync=False):
+        if self._pending:
+            self._file.write(b"".join(self._pending))
+            self._file.flush()
+            self._pending = []
+            self._pending_since = None
+            self._unsynced = True
+            self.batches += 1
+            if self.fsync == "batch":
+                sync = True
+        if self.fsync == "interval" and self._unsynced and time.monotonic() - self._last_sync >= self.fsync_interval:
+            sync = True
+        if sync and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = False
+            self._last_sync = time.monotonic()
+            self.syncs += 1
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                deadlines = []
+                if self._pending:
+                    deadlines.append(self._pending_since + self.batch_delay)
+                if self.fsync == "interval" and self._unsynced:
+                    deadlines.append(self._last_sync + self.fsync_interval)
+                if not deadlines:
+                    self._cond.wait()
+                elif min(deadlines) <= now:
+                    try:
+                        self._flush_locked()
+                    except Exception as e:
+                        print(f"Error flushing {self.path}: {e}", flush=True)
+                        self._cond.wait(1)
+                else:
+                    self._cond.wait(min(deadlines) - now)
+
+
+def last_lines(path, count=1):
+    """Return the last `count` lines of path by scanning a memory map backwards from the end"""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return []
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as m:
+            end = size
+            # A trailing newline terminates the last line rather than starting a new one
+            if m[end - 1] == ord("\n"):
+                end -= 1
+            start = end
+            for _ in range(count):
+                index = m.rfind(b"\n", 0, start)
+                if index < 0:
+                    start = 0
+                    break
+                start = index
+            else:
+                start += 1
+            return m[start:end].decode("utf-8", errors="replace").split("\n")
+
+
+def parse_time_bound(value):
+    """Normalise an ISO 8601 query value to the writers' YYYY-MM-DDTHH:MM:SS.mmmZ form, which sorts as text"""
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+def iter_lines(f, offset):
+    """Yield (offset, line) for the complete lines from offset on"""
+    f.seek(offset)
+    carry = b""
+    while True:
+        block = f.read(READ_CHUNK)
+        if not block:
+            return
+        data = carry + block
+        position = 0
+        while True:
+            index = data.find(b"\n", position)
+            if index < 0:
+                break
+            yield offset + position, data[position:index + 1]
+            position = index + 1
+        offset += position
+        carry = data[position:]
+
+
+class TimeIndex:
+    """Sparse (timestamp, offset) samples of a log, one per `stride` bytes, extended as the log grows"""
+
+    def __init__(self, path, stride=256 * 1024):
+        self.path = path
+        self.stride = stride
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, inode):
+        self.inode = inode
+        self.size = 0
+        self.times = []
+        self.offsets = []
+        self.next_boundary = 0
+
+    def _sample(self, f, boundary):
+        """Return (timestamp, offset) of the first entry starting at or after boundary, False if the
+        sample window holds none, or None if the log ends first"""
+        start = max(boundary - 1, 0)
+        f.seek(start)
+        data = f.read(TIME_INDEX_WINDOW)
+        # Unless at the start of the file, the first line begins after the newline preceding the boundary
+        position = 0 if boundary == 0 else data.find(b"\n") + 1
+        if boundary and not position:
+            return False if len(data) == TIME_INDEX_WINDOW else None
+        while True:
+            index = data.find(b"\n", position)
+            if index < 0:
+                return False if len(data) == TIME_INDEX_WINDOW else None
+            match = TIMESTAMP_LINE.match(data, position)
+            if match:
+                return match.group(1).decode(), start + position
+            position = index + 1
+
+    def _refresh(self, f):
+        st = os.fstat(f.fileno())
+        if st.st_ino != self.inode or st.st_size < self.size:
+            # The log was replaced or truncated
+            self._reset(st.st_ino)
+        self.size = st.st_size
+        while self.next_boundary < self.size:
+            entry = self._sample(f, self.next_boundary)
+            if entry is None:
+                # Not enough written past this boundary yet
+                break
+            if entry and (not self.offsets or entry[1] > self.offsets[-1]):
+                self.times.append(entry[0])
+                self.offsets.append(entry[1])
+            self.next_boundary += self.stride
+
+    def _find(self, f, moment):
+        # Start from the last sample before moment; at most about one stride is read from there
+        i = bisect.bisect_left(self.times, moment) - 1
+        offset = self.offsets[i] if i >= 0 else 0
+        for line_start, line in iter_lines(f, offset):
+            if line_start >= self.size:
+                break
+            match = TIMESTAMP_LINE.match(line)
+            if match and match.group(1).decode() >= moment:
+                return line_start
+        return self.size
+
+    def byte_range(self, start=None, end=None):
+        """Return the byte range holding the entries with start <= timestamp < end"""
+        with self._lock, open(self.path, "rb") as f:
+            self._refresh(f)
+            low = self._find(f, start) if start else 0
+            high = self._find(f, end) if end else self.size
+            return low, max(low, high)
+
+
+class MicroCache:
+    """Keeps computed values for a short TTL; only one caller at a time recomputes an expired key"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._refreshing = {}
+
+    def get(self, key, compute):
+        if self.ttl <= 0:
+            return compute()
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    return entry[1]
+                event = self._refreshing.get(key)
+                if event is None:
+                    event = self._refreshing[key] = threading.Event()
+                    break
+                if entry is not None:
+                    # Someone is already refreshing; serve the previous value meanwhile
+                    return entry[1]
+            # Nothing cached yet: wait for the refresh in flight, or take over if it failed
+            event.wait()
+        try:
+            value = compute()
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+            return value
+        finally:
+            with self._lock:
+                del self._refreshing[key]
+            event.set()
@@ -1,13 +1,48 @@
-from fastapi import FastAPI
-from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import PlainTextResponse, JSONResponse, StreamingResponse
+from typing import Optional
 import uvicorn
+import asyncio
+import ctypes
+import ctypes.util
+import json
 import os
 import requests
+import select
+import threading
+import time
+from log_common import TimeIndex, parse_time_bound
 
 app = FastAPI(title="Log Output Reader")
 
 # File path in shared volume
 LOG_FILE = "/shared/log.txt"
+# Written by the writer when it rotates log.txt into numbered segments
+MANIFEST_FILE = "/shared/log.manifest.json"
+
+# Response header carrying the byte offset to pass as ?since= on the next request.
+# Offsets count bytes across all segments, so they stay valid when log.txt is rotated.
+OFFSET_HEADER = "X-Log-Offset"
+# Block size for streaming the file and for scanning backwards in ?tail=
+READ_CHUNK = 64 * 1024
+TAIL_MAX = 10000
+
+# Sidecar where the line index survives restarts, so only bytes appended since are scanned
+INDEX_FILE = LOG_FILE + ".idx"
+
+# /logs: each log file gets a sparse time index with one sample per TIME_INDEX_STRIDE bytes, so a range
+# query reads about one stride per bound instead of the whole log
+TIME_INDEX_STRIDE = int(os.getenv("TIME_INDEX_STRIDE", str(256 * 1024)))
+
+# /status/stream: the shared tailer rescans on inotify events, and at least every STREAM_POLL_INTERVAL
+# seconds (the only trigger where inotify is unavailable); idle streams get a comment every STREAM_KEEPALIVE
+STREAM_POLL_INTERVAL = float(os.getenv("STREAM_POLL_INTERVAL", "1"))
+STREAM_KEEPALIVE = float(os.getenv("STREAM_KEEPALIVE", "15"))
+# Batches a client may fall behind before it is disconnected (it can resume with Last-Event-ID)
+STREAM_QUEUE_MAX = int(os.getenv("STREAM_QUEUE_MAX", "1000"))
+# Most bytes replayed to a client resuming from an offset, and read by the tailer per scan
+STREAM_REPLAY_MAX = 1024 * 1024
+STREAM_READ_MAX = 1024 * 1024
 
 # PingPong service URL for readiness checks
 PINGPONG_URL = os.getenv("PINGPONG_URL") or os.getenv("PINGPONG_SERVICE_URL", "http://pingpong-service.exercises:80/pings")
@@ -17,29 +52,269 @@ async def root():
     return {"message": "Log Output App - Use /status endpoint"}
 
 
+def log_segments():
+    """Return the readable segments oldest first, each with path, start offset, size and line count; log.txt is last"""
+    manifest = st = None
+    for _ in range(3):
+        try:
+            with open(MANIFEST_FILE) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = None
+        try:
+            st = os.stat(LOG_FILE)
+        except FileNotFoundError:
+            st = None
+        if manifest is None or (st is not None and st.st_ino == manifest["active"]["inode"]):
+            break
+        # The writer rotated between reading the manifest and the log, so read both again
+        time.sleep(0.01)
+    if manifest is None:
+        # A writer that does not rotate only ever has log.txt
+        return [] if st is None else [{"path": LOG_FILE, "start": 0, "size": st.st_size, "lines": None, "first": None, "last": None}]
+    directory = os.path.dirname(MANIFEST_FILE)
+    segments = [
+        {
+            "path": os.path.join(directory, segment["name"]),
+            "start": segment["start"],
+            "size": segment["bytes"],
+            "lines": segment["lines"],
+            "first": segment["first"],
+            "last": segment["last"],
+        }
+        for segment in manifest["segments"]
+    ]
+    segments.append({
+        "path": LOG_FILE,
+        "start": manifest["active"]["start"],
+        "size": st.st_size if st else 0,
+        "lines": None,
+        "first": manifest["active"].get("first"),
+        "last": None,
+    })
+    return segments
+
+
+def tail_scan(f, end, lines):
+    """Return where the last `lines` lines before `end` begin, and how many lines were found"""
+    position = end
+    found = 0
+    # A trailing newline terminates the last line rather than starting a new one
+    f.seek(max(end - 1, 0))
+    if end and f.read(1) == b"\n":
+        position -= 1
+    while position > 0:
+        size = min(READ_CHUNK, position)
+        f.seek(position - size)
+        block = f.read(size)
+        index = len(block)
+        while True:
+            index = block.rfind(b"\n", 0, index)
+            if index < 0:
+                break
+            found += 1
+            if found == lines:
+                return position - size + index + 1, found
+        position -= size
+    # The first line of the file has no newline before it
+    return 0, found + 1 if end else 0
+
+
+def tail_offset(segments, lines):
+    """Return the offset where the last `lines` lines across segments begin"""
+    for segment in reversed(segments):
+        try:
+            with open(segment["path"], "rb") as f:
+                offset, found = tail_scan(f, segment["size"], lines)
+        except FileNotFoundError:
+            # Removed by retention since the manifest was read
+            break
+        if found >= lines:
+            return segment["start"] + offset
+        lines -= found
+    return segments[0]["start"]
+
+
+def stream_range(path, start, end):
+    """Yield the bytes of path between start and end in READ_CHUNK blocks"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(READ_CHUNK, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def stream_segments(segments, start, end):
+    """Yield the bytes between two offsets, crossing segment boundaries"""
+    for segment in segments:
+        low = max(start, segment["start"])
+        high = min(end, segment["start"] + segment["size"])
+        if low < high:
+            yield from stream_range(segment["path"], low - segment["start"], high - segment["start"])
+
+
+def last_line(path):
+    """Return the last line of a file"""
+    with open(path, "rb") as f:
+        end = os.fstat(f.fileno()).st_size
+        offset, _ = tail_scan(f, end, 1)
+        f.seek(offset)
+        return f.read(end - offset).decode("utf-8", errors="replace")
+
+
 @app.get("/status", response_class=PlainTextResponse)
-async def status():
-    """Read and return the log file content"""
+async def status(
+    since: Optional[int] = Query(None, ge=0),
+    tail: Optional[int] = Query(None, ge=1, le=TAIL_MAX),
+):
+    """Return the log file content, only the bytes after ?since=, or the last ?tail= lines"""
     try:
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, "r") as f:
-                content = f.read()
-            return content
+        segments = log_segments()
+        if segments:
+            # Only serve what was written before this request so the offset header matches the body
+            end = segments[-1]["start"] + segments[-1]["size"]
+            start = segments[0]["start"]
+            # A since before the oldest segment was removed by retention, and one past the end means
+            # the log was recreated; both start over from the oldest segment
+            if since is not None and start <= since <= end:
+                start = since
+            if tail is not None:
+                start = max(start, tail_offset(segments, tail))
+            return StreamingResponse(
+                stream_segments(segments, start, end),
+                media_type="text/plain; charset=utf-8",
+                headers={OFFSET_HEADER: str(end)},
+            )
         else:
-            return "Log file not found yet. Waiting for writer to create it...\n"
+            return PlainTextResponse("Log file not found yet. Waiting for writer to create it...\n", headers={OFFSET_HEADER: "0"})
     except Exception as e:
         return f"Error reading log file: {str(e)}\n"
 
 
+class LineIndex:
+    """Line count and last-line position of an append-only file, updated from the bytes appended since the last call"""
+
+    def __init__(self, path, index_path):
+        self.path = path
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._reset(None)
+        self._load()
+
+    def _reset(self, inode):
+        self.inode = inode
+        # Bytes scanned so far, newlines among them, where the line after the last newline starts,
+        # and where the line before it starts
+        self.size = 0
+        self.newlines = 0
+        self.line_start = 0
+        self.prev_line_start = 0
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                state = json.load(f)
+            self.inode = state["inode"]
+            self.size = state["size"]
+            self.newlines = state["newlines"]
+            self.line_start = state["line_start"]
+            self.prev_line_start = state["prev_line_start"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ignoring unreadable line index {self.index_path}: {e}", flush=True)
+            self._reset(None)
+
+    def _save(self):
+        state = {
+            "inode": self.inode,
+            "size": self.size,
+            "newlines": self.newlines,
+            "line_start": self.line_start,
+            "prev_line_start": self.prev_line_start,
+        }
+        try:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            print(f"Error saving line index {self.index_path}: {e}", flush=True)
+
+    def _valid(self, f, st):
+        """Whether the stored state still describes this file"""
+        if self.inode != st.st_ino or self.size > st.st_size:
+            return False
+        if self.line_start == 0:
+            return True
+        f.seek(self.line_start - 1)
+        return f.read(1) == b"\n"
+
+    def update(self):
+        """Scan the bytes appended since the last update and return (total_lines, last_line)"""
+        with self._lock, open(self.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if not self._valid(f, st):
+                # The file was replaced or truncated
+                self._reset(st.st_ino)
+            end = st.st_size
+            if end > self.size:
+                f.seek(self.size)
+                position = self.size
+                while position < end:
+                    block = f.read(min(READ_CHUNK, end - position))
+                    if not block:
+                        break
+                    count = block.count(b"\n")
+                    if count:
+                        # Only the last two newlines of a block matter for the line positions
+                        last = block.rfind(b"\n")
+                        if count > 1:
+                            self.prev_line_start = position + block.rfind(b"\n", 0, last) + 1
+                        else:
+                            self.prev_line_start = self.line_start
+                        self.line_start = position + last + 1
+                        self.newlines += count
+                    position += len(block)
+                self.size = position
+                self._save()
+            # Like readlines(), an unterminated final line counts as a line
+            if self.size > self.line_start:
+                total_lines = self.newlines + 1
+                f.seek(self.line_start)
+                last_line = f.read(self.size - self.line_start)
+            else:
+                total_lines = self.newlines
+                f.seek(self.prev_line_start)
+                last_line = f.read(self.line_start - self.prev_line_start)
+            return total_lines, last_line.decode("utf-8", errors="replace")
+
+
+line_index = LineIndex(LOG_FILE, INDEX_FILE)
+
+
 @app.get("/status/json")
 async def status_json():
     """Return status as JSON with latest line"""
     try:
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, "r") as f:
-                lines = f.readlines()
-            if lines:
-                latest_line = lines[-1].strip()
+        segments = log_segments()
+        if segments:
+            total_lines, latest_line = line_index.update()
+            # The line index only covers log.txt; rotated segments carry their line counts in the manifest
+            rotated = segments[:-1]
+            total_lines += sum(segment["lines"] for segment in rotated)
+            if not latest_line and rotated:
+                latest_line = last_line(rotated[-1]["path"])
+            if total_lines:
+                latest_line = latest_line.strip()
                 # Parse the line: "YYYY-MM-DD HH:MM:SS random_string"
                 # Split by space, but timestamp has 2 parts (date and time)
                 parts = latest_line.split(" ", 2)
@@ -49,7 +324,7 @@ async def status_json():
                     return JSONResponse(content={
                         "timestamp": timestamp,
                         "random_string": random_string,
-                        "total_lines": len(lines)
+                        "total_lines": total_lines
                     })
             return JSONResponse(content={
                 "timestamp": None,
@@ -63,6 +338,234 @@ async def status_json():
     except Exception as e:
         return JSONResponse(content={"error": str(e)})
 
+# One index per segment file; entries for segments removed by retention are dropped on the next query
+time_indexes = {}
+
+
+@app.get("/logs", response_class=PlainTextResponse)
+def logs(start: Optional[str] = Query(None, alias="from"), end: Optional[str] = Query(None, alias="to")):
+    """Return the log entries with from <= timestamp < to (ISO 8601), reading only the matching byte ranges"""
+    try:
+        start = parse_time_bound(start) if start else None
+        end = parse_time_bound(end) if end else None
+    except ValueError as e:
+        return PlainTextResponse(f"Invalid timestamp: {str(e)}\n", status_code=400)
+    try:
+        segments = log_segments()
+        for path in set(time_indexes) - {segment["path"] for segment in segments}:
+            time_indexes.pop(path, None)
+        ranges = []
+        for segment in segments:
+            # The manifest's first and last timestamps let whole segments be skipped unopened
+            if end and segment["first"] and segment["first"] >= end:
+                break
+            if start and segment["last"] and segment["last"] < start:
+                continue
+            index = time_indexes.get(segment["path"])
+            if index is None:
+                index = time_indexes[segment["path"]] = TimeIndex(segment["path"], TIME_INDEX_STRIDE)
+            try:
+                low, high = index.byte_range(start, end)
+            except FileNotFoundError:
+                continue
+            if low < high:
+                ranges.append((segment["path"], low, high))
+    except Exception as e:
+        return PlainTextResponse(f"Error reading log file: {str(e)}\n", status_code=500)
+
+    def stream():
+        for path, low, high in ranges:
+            yield from stream_range(path, low, high)
+
+    return StreamingResponse(stream(), media_type="text/plain; charset=utf-8")
+
+
+def split_lines(data, start):
+    """Split complete lines into (end offset, text) pairs, without their newlines"""
+    lines = []
+    position = 0
+    while True:
+        index = data.find(b"\n", position)
+        if index < 0:
+            return lines
+        lines.append((start + index + 1, data[position:index].decode("utf-8", errors="replace")))
+        position = index + 1
+
+
+def load_inotify():
+    """Return libc with the inotify calls resolved, or None where inotify is unavailable"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+# Resolved once: find_library runs ldconfig on every call
+inotify_libc = load_inotify()
+
+
+def open_inotify():
+    """Return a new inotify descriptor, or None where inotify is unavailable"""
+    if inotify_libc is None:
+        return None
+    fd = inotify_libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    return fd if fd >= 0 else None
+
+
+def add_inotify_watch(fd, directory):
+    """Watch directory for writes and renames; False while it cannot be watched, e.g. before it exists"""
+    in_modify, in_moved_to, in_create = 0x2, 0x80, 0x100
+    return inotify_libc.inotify_add_watch(fd, os.fsencode(directory), in_modify | in_moved_to | in_create) >= 0
+
+
+class LogTailer:
+    """Follows the log across segments in one thread and fans complete new lines out to stream subscribers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._fd = None
+        self._watching = False
+        self.position = None
+
+    def subscribe(self):
+        """Register a queue for new lines and return it with the offset it starts after"""
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_MAX)
+        subscriber = (queue, asyncio.get_running_loop())
+        with self._lock:
+            if self._thread is None:
+                # Start following from the current end; history is only sent to resuming clients
+                segments = log_segments()
+                self.position = segments[-1]["start"] + segments[-1]["size"] if segments else 0
+                self._thread = threading.Thread(target=self._run, name="log-tailer", daemon=True)
+                self._thread.start()
+            self._subscribers.add(subscriber)
+            return subscriber, self.position
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _deliver(self, queue, lines):
+        # Runs on the subscriber's event loop
+        if queue.full():
+            # Too far behind: drop what is queued and tell the client to reconnect
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        else:
+            queue.put_nowait(lines)
+
+    def _scan(self):
+        segments = log_segments()
+        if not segments:
+            return
+        end = segments[-1]["start"] + segments[-1]["size"]
+        if end < self.position:
+            # The log was recreated, so follow the new one from its beginning
+            self.position = segments[0]["start"]
+        while self.position < end:
+            start = max(self.position, segments[0]["start"])
+            data = b"".join(stream_segments(segments, start, min(end, start + STREAM_READ_MAX)))
+            cut = data.rfind(b"\n") + 1
+            if cut:
+                lines = split_lines(data[:cut], start)
+            elif len(data) < STREAM_READ_MAX:
+                # Hold back a partial last line until it is complete
+                return
+            else:
+                # A line longer than a whole read is sent in pieces
+                cut = len(data)
+                lines = [(start + cut, data.decode("utf-8", errors="replace"))]
+            with self._lock:
+                self.position = start + cut
+                for queue, loop in self._subscribers:
+                    loop.call_soon_threadsafe(self._deliver, queue, lines)
+
+    def _wait(self):
+        """Block until the log directory changes or the poll interval passes"""
+        if not self._watching:
+            if self._fd is None:
+                self._fd = open_inotify()
+            # Only the watch is retried, until the log directory appears
+            self._watching = self._fd is not None and add_inotify_watch(self._fd, os.path.dirname(LOG_FILE))
+            if not self._watching:
+                time.sleep(STREAM_POLL_INTERVAL)
+                return
+        readable, _, _ = select.select([self._fd], [], [], STREAM_POLL_INTERVAL)
+        if readable:
+            try:
+                while os.read(self._fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def _run(self):
+        while True:
+            try:
+                self._scan()
+            except Exception as e:
+                print(f"Error tailing log: {e}", flush=True)
+            self._wait()
+
+
+log_tailer = LogTailer()
+
+
+def replay_lines(since, until):
+    """Return the complete lines between two offsets, at most STREAM_REPLAY_MAX bytes from the end"""
+    segments = log_segments()
+    if not segments:
+        return []
+    start = max(since, until - STREAM_REPLAY_MAX, segments[0]["start"])
+    data = b"".join(stream_segments(segments, start, until))
+    if start > since:
+        # Trimmed: skip the partial line at the cut
+        skip = data.find(b"\n") + 1
+        data, start = data[skip:], start + skip
+    return split_lines(data, start)
+
+
+def format_events(lines):
+    return "".join(f"id: {offset}\ndata: {text}\n\n" for offset, text in lines)
+
+
+@app.get("/status/stream")
+async def status_stream(request: Request, since: Optional[int] = Query(None, ge=0)):
+    """Stream newly appended log lines as server-sent events; ?since= or Last-Event-ID resumes from an offset"""
+    last_event_id = request.headers.get("last-event-id", "")
+    if since is None and last_event_id.isdigit():
+        since = int(last_event_id)
+    subscriber, position = log_tailer.subscribe()
+    queue = subscriber[0]
+
+    async def events():
+        try:
+            yield "retry: 2000\n\n"
+            if since is not None and since < position:
+                yield format_events(await asyncio.to_thread(replay_lines, since, position))
+            while True:
+                try:
+                    lines = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if lines is None:
+                    return
+                yield format_events(lines)
+        finally:
+            log_tailer.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", OFFSET_HEADER: str(position)},
+    )
+
+
 @app.get("/healthz")
 async def healthz():
     """Readiness probe: only ready when PingPong is reachable."""
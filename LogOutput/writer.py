@@ -1,9 +1,15 @@
 import secrets
 import string
 import time
+import json
 import os
+import random
+import re
+import signal
+import threading
 import requests
 from datetime import datetime
+from log_common import Appender
 
 # Generate random string on startup
 def generate_random_string(length: int = 16) -> str:
@@ -15,20 +21,217 @@ def now_timestamp() -> str:
 
 # File path in shared volume (only for log output, not for pingpong count)
 LOG_FILE = "/shared/log.txt"
+# Lists the rotated segments (log.txt.000001, ...) and the active log's position, for the reader
+MANIFEST_FILE = "/shared/log.manifest.json"
+# Rotate the active log once it reaches this many bytes or is this many seconds old (0 disables either)
+LOG_SEGMENT_MAX_BYTES = int(os.getenv("LOG_SEGMENT_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_SEGMENT_MAX_AGE = float(os.getenv("LOG_SEGMENT_MAX_AGE", "86400"))
+# Keep at most this many rotated segments, none older than this many seconds (0 keeps everything)
+LOG_RETENTION_SEGMENTS = int(os.getenv("LOG_RETENTION_SEGMENTS", "30"))
+LOG_RETENTION_SECONDS = float(os.getenv("LOG_RETENTION_SECONDS", "0"))
+
+# Seconds between log entries
+LOG_INTERVAL = float(os.getenv("LOG_INTERVAL", "5"))
+# The log stays open and entries are written in batches of up to LOG_BATCH_LINES, at most
+# LOG_BATCH_DELAY_MS after the first one was appended
+LOG_BATCH_LINES = int(os.getenv("LOG_BATCH_LINES", "100"))
+LOG_BATCH_DELAY_MS = float(os.getenv("LOG_BATCH_DELAY_MS", "200"))
+# Durability: "none" leaves syncing to the OS, "interval" fsyncs every LOG_FSYNC_INTERVAL seconds
+# while there is unsynced data, "batch" fsyncs after every batch
+LOG_FSYNC = os.getenv("LOG_FSYNC", "interval").lower()
+LOG_FSYNC_INTERVAL = float(os.getenv("LOG_FSYNC_INTERVAL", "1"))
+
+# Lines starting with "<timestamp>: " open a log entry
+TIMESTAMP_LINE = re.compile(r"^(\S+Z): ")
+
+
+class SegmentedLog:
+    """Appends to the active log file, rotating it into numbered segments listed in a manifest"""
+
+    def __init__(self, path, manifest_path):
+        self.path = path
+        self.manifest_path = manifest_path
+        self.directory = os.path.dirname(path)
+        self.manifest = self._load_manifest()
+        self._recover_active()
+        self.appender = Appender(path, fsync=LOG_FSYNC, batch_lines=LOG_BATCH_LINES, batch_delay_ms=LOG_BATCH_DELAY_MS,
+                                 fsync_interval=LOG_FSYNC_INTERVAL)
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ignoring unreadable manifest {self.manifest_path}: {e}", flush=True)
+        return {"next_seq": 1, "segments": [], "active": None}
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _recover_active(self):
+        """Rebuild the active segment's size, line count and timestamps from the file"""
+        with open(self.path, "a"):
+            pass
+        st = os.stat(self.path)
+        self.size = 0
+        self.lines = 0
+        first = last = None
+        with open(self.path, "r", errors="replace") as f:
+            for line in f:
+                self.size += len(line.encode())
+                self.lines += line.count("\n")
+                match = TIMESTAMP_LINE.match(line)
+                if match:
+                    first = first or match.group(1)
+                    last = match.group(1)
+        self.last = last
+        active = self.manifest.get("active")
+        if active is None or active.get("inode") != st.st_ino:
+            # First run, or log.txt was replaced: it continues after the last rotated segment
+            segments = self.manifest["segments"]
+            start = segments[-1]["start"] + segments[-1]["bytes"] if segments else 0
+            active = {"start": start, "inode": st.st_ino, "first": first, "created": time.time()}
+            self.manifest["active"] = active
+            self._save_manifest()
+        elif active.get("first") is None and first is not None:
+            active["first"] = first
+            self._save_manifest()
+
+    def _should_rotate(self):
+        if self.size == 0:
+            return False
+        if LOG_SEGMENT_MAX_BYTES and self.size >= LOG_SEGMENT_MAX_BYTES:
+            return True
+        return bool(LOG_SEGMENT_MAX_AGE) and time.time() - self.manifest["active"]["created"] >= LOG_SEGMENT_MAX_AGE
+
+    def rotate(self):
+        """Seal the active log as the next numbered segment and start a new one"""
+        active = self.manifest["active"]
+        name = f"{os.path.basename(self.path)}.{self.manifest['next_seq']:06d}"
+        os.rename(self.path, os.path.join(self.directory, name))
+        # Batches still pending land in the renamed file before the new log.txt is opened
+        self.appender.reopen()
+        self.manifest["segments"].append({
+            "name": name,
+            "start": active["start"],
+            "bytes": self.size,
+            "lines": self.lines,
+            "first": active["first"],
+            "last": self.last,
+            "sealed_at": time.time(),
+        })
+        self.manifest["next_seq"] += 1
+        self.manifest["active"] = {
+            "start": active["start"] + self.size,
+            "inode": os.stat(self.path).st_ino,
+            "first": None,
+            "created": time.time(),
+        }
+        self.size = 0
+        self.lines = 0
+        self.last = None
+        expired = self._apply_retention()
+        self._save_manifest()
+        # Delete only after the manifest stops listing the files
+        for segment in expired:
+            try:
+                os.remove(os.path.join(self.directory, segment["name"]))
+            except FileNotFoundError:
+                pass
+        print(f"Rotated log into {name}, removed {len(expired)} expired segments", flush=True)
+
+    def _apply_retention(self):
+        segments = self.manifest["segments"]
+        keep = len(segments)
+        if LOG_RETENTION_SEGMENTS:
+            keep = min(keep, LOG_RETENTION_SEGMENTS)
+        if LOG_RETENTION_SECONDS:
+            cutoff = time.time() - LOG_RETENTION_SECONDS
+            keep = min(keep, sum(1 for segment in segments if segment["sealed_at"] >= cutoff))
+        expired = segments[:len(segments) - keep]
+        self.manifest["segments"] = segments[len(segments) - keep:]
+        return expired
+
+    def append(self, text, timestamp):
+        if self._should_rotate():
+            self.rotate()
+        self.appender.write(text)
+        self.size += len(text.encode())
+        self.lines += text.count("\n")
+        self.last = timestamp
+        active = self.manifest["active"]
+        if active["first"] is None:
+            active["first"] = timestamp
+            self._save_manifest()
+
+    def close(self):
+        self.appender.close()
+
+
 # PingPong service URL from environment variable
 PINGPONG_SERVICE_URL = os.getenv("PINGPONG_SERVICE_URL", "http://pingpong-service.exercises:80")
+# The count is polled in the background every PINGPONG_POLL_INTERVAL seconds; the log uses the last known value
+PINGPONG_POLL_INTERVAL = float(os.getenv("PINGPONG_POLL_INTERVAL", str(LOG_INTERVAL)))
+PINGPONG_TIMEOUT = float(os.getenv("PINGPONG_TIMEOUT", "2"))
+# After PINGPONG_FAILURE_THRESHOLD failures in a row the breaker opens and polling backs off
+# exponentially from PINGPONG_BACKOFF_MIN up to PINGPONG_BACKOFF_MAX seconds
+PINGPONG_FAILURE_THRESHOLD = int(os.getenv("PINGPONG_FAILURE_THRESHOLD", "3"))
+PINGPONG_BACKOFF_MIN = float(os.getenv("PINGPONG_BACKOFF_MIN", "5"))
+PINGPONG_BACKOFF_MAX = float(os.getenv("PINGPONG_BACKOFF_MAX", "60"))
 
-def get_pingpong_count():
-    """Get ping-pong counter via HTTP from PingPong service"""
-    try:
-        response = requests.get(f"{PINGPONG_SERVICE_URL}/pings", timeout=2)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("count", 0)
-        return 0
-    except Exception as e:
-        print(f"Error fetching ping-pong count: {e}", flush=True)
-        return 0
+
+class PingPongPoller:
+    """Fetches the ping-pong count in the background, behind a circuit breaker"""
+
+    def __init__(self, url):
+        self.url = url
+        self.count = 0
+        self.failures = 0
+        self._session = requests.Session()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Fetch once so the first entry has a real count, then keep polling in the background"""
+        delay = self.poll()
+        self._thread = threading.Thread(target=self._run, args=(delay,), name="pingpong-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=PINGPONG_TIMEOUT + 1)
+
+    def poll(self):
+        """Fetch the count once and return the seconds until the next attempt"""
+        try:
+            response = self._session.get(f"{self.url}/pings", timeout=PINGPONG_TIMEOUT)
+            response.raise_for_status()
+            self.count = response.json().get("count", 0)
+        except Exception as e:
+            self.failures += 1
+            if self.failures < PINGPONG_FAILURE_THRESHOLD:
+                print(f"Error fetching ping-pong count: {e}", flush=True)
+                return PINGPONG_POLL_INTERVAL
+            # Open (or keep open) the breaker; a single probe is let through once the backoff expires
+            exponent = self.failures - PINGPONG_FAILURE_THRESHOLD
+            backoff = min(PINGPONG_BACKOFF_MAX, PINGPONG_BACKOFF_MIN * 2 ** min(exponent, 16))
+            backoff *= random.uniform(0.8, 1.2)
+            print(f"PingPong unavailable ({self.failures} failures), retrying in {backoff:.1f}s: {e}", flush=True)
+            return backoff
+        if self.failures >= PINGPONG_FAILURE_THRESHOLD:
+            print(f"PingPong reachable again after {self.failures} failures", flush=True)
+        self.failures = 0
+        return PINGPONG_POLL_INTERVAL
+
+    def _run(self, delay):
+        while not self._stopped.wait(delay):
+            delay = self.poll()
 
 # ConfigMap file path
 CONFIG_FILE = "/config/information.txt"
@@ -47,7 +250,12 @@ def read_config_file():
 # Generate random string on startup
 stored_value = generate_random_string()
 
-# Write to file every 5 seconds
+def handle_sigterm(signum, frame):
+    """Turn SIGTERM into SystemExit so pending entries are flushed on the way out"""
+    raise SystemExit(0)
+
+
+# Write to file every LOG_INTERVAL seconds
 if __name__ == "__main__":
     # Read ConfigMap values once at startup
     config_file_content = read_config_file()
@@ -56,14 +264,29 @@ if __name__ == "__main__":
     # Print ConfigMap values
     print(f"file content: {config_file_content}", flush=True)
     print(f"env variable: MESSAGE={message_env}", flush=True)
-    
-    while True:
-        pingpong_count = get_pingpong_count()
-        # Format: ISO timestamp with Z: random_string.\nPing / Pongs: count
-        timestamp_iso = datetime.now().isoformat(timespec='milliseconds') + 'Z'
-        log_line = f"{timestamp_iso}: {stored_value}.\nPing / Pongs: {pingpong_count}\n"
-        with open(LOG_FILE, "a") as f:
-            f.write(log_line)
-            f.flush()
-        print(f"Written: {log_line.strip()}", flush=True)
-        time.sleep(5)
+
+    log = SegmentedLog(LOG_FILE, MANIFEST_FILE)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    poller = PingPongPoller(PINGPONG_SERVICE_URL)
+    poller.start()
+
+    try:
+        next_tick = time.monotonic()
+        while True:
+            pingpong_count = poller.count
+            # Format: ISO timestamp with Z: random_string.\nPing / Pongs: count
+            timestamp_iso = datetime.now().isoformat(timespec='milliseconds') + 'Z'
+            log_line = f"{timestamp_iso}: {stored_value}.\nPing / Pongs: {pingpong_count}\n"
+            log.append(log_line, timestamp_iso)
+            print(f"Written: {log_line.strip()}", flush=True)
+            # Ticks stay on a fixed schedule; if one overran, skip the missed ticks instead of bunching up
+            next_tick += LOG_INTERVAL
+            now = time.monotonic()
+            if next_tick < now:
+                next_tick += (now - next_tick) // LOG_INTERVAL * LOG_INTERVAL + LOG_INTERVAL
+            time.sleep(next_tick - now)
+    finally:
+        poller.stop()
+        log.close()
+        print("Log flushed, exiting", flush=True)
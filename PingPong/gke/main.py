@@ -2,6 +2,7 @@ import os
 import time
 import psycopg2
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from observability import HealthChecker, Metrics, connection_check
 
 # Database configuration
 DB_HOST = os.getenv("DB_HOST", "postgres-svc")
@@ -9,17 +10,36 @@ DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "pingpong")
 DB_USER = os.getenv("DB_USER", "pingpong")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "pingpong")
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+# Health checks run in the background every HEALTH_CHECK_INTERVAL seconds;
+# probes report unready once the last check is older than HEALTH_MAX_AGE
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))
+HEALTH_MAX_AGE = float(os.getenv("HEALTH_MAX_AGE", "15"))
+
+
+metrics = Metrics()
+metrics.describe("pingpong_http_requests_total", "counter", "HTTP requests by endpoint, method and status")
+metrics.describe("pingpong_http_request_duration_seconds", "histogram", "HTTP request latency by endpoint")
+metrics.describe("pingpong_db_phase_duration_seconds", "histogram", "Database time by phase (connect, query, commit)")
+metrics.describe("pingpong_db_connect_retries_total", "counter", "Retries in init_db after a failed database attempt")
+metrics.inc("pingpong_db_connect_retries_total", 0)
+
+# Paths reported as their own endpoint label; anything else is "unmatched"
+METRIC_ENDPOINTS = {"/", "/pingpong", "/health", "/healthz", "/pings", "/metrics"}
 
 
 def get_db_connection():
     """Get database connection"""
-    return psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
+    with metrics.timer("pingpong_db_phase_duration_seconds", phase="connect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            connect_timeout=DB_CONNECT_TIMEOUT
+        )
 
 
 def init_db():
@@ -45,6 +65,7 @@ def init_db():
             print("Database initialized successfully")
             return
         except Exception as e:
+            metrics.inc("pingpong_db_connect_retries_total")
             print(f"Database connection failed, retrying... ({e})")
             retries -= 1
             time.sleep(2)
@@ -56,7 +77,8 @@ def get_counter():
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("SELECT count FROM counter WHERE id = 1")
+        with metrics.timer("pingpong_db_phase_duration_seconds", phase="query"):
+            cur.execute("SELECT count FROM counter WHERE id = 1")
         result = cur.fetchone()
         cur.close()
         conn.close()
@@ -71,9 +93,11 @@ def increment_counter():
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("UPDATE counter SET count = count + 1 WHERE id = 1 RETURNING count")
+        with metrics.timer("pingpong_db_phase_duration_seconds", phase="query"):
+            cur.execute("UPDATE counter SET count = count + 1 WHERE id = 1 RETURNING count")
         result = cur.fetchone()
-        conn.commit()
+        with metrics.timer("pingpong_db_phase_duration_seconds", phase="commit"):
+            conn.commit()
         cur.close()
         conn.close()
         return result[0] if result else 0
@@ -82,8 +106,25 @@ def increment_counter():
         return 0
 
 
+health_checker = HealthChecker(connection_check(get_db_connection), HEALTH_CHECK_INTERVAL, HEALTH_MAX_AGE)
+
+
 class PingPongHandler(BaseHTTPRequestHandler):
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
     def do_GET(self):
+        started = time.perf_counter()
+        self._status = 500
+        try:
+            self.handle_get()
+        finally:
+            endpoint = self.path if self.path in METRIC_ENDPOINTS else "unmatched"
+            metrics.inc("pingpong_http_requests_total", endpoint=endpoint, method="GET", status=self._status)
+            metrics.observe("pingpong_http_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+
+    def handle_get(self):
         if self.path == "/" or self.path == "/pingpong":
             # Main pingpong endpoint - responds at / (rewritten from /pingpong)
             counter = get_counter()
@@ -99,6 +140,13 @@ class PingPongHandler(BaseHTTPRequestHandler):
             self.send_header("Content-Type", "text/plain")
             self.end_headers()
             self.wfile.write(b"ok")
+        elif self.path == "/healthz":
+            # Readiness probe - answers from the background database check
+            healthy, message = health_checker.status_text()
+            self.send_response(200 if healthy else 500)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(message.encode())
         elif self.path == "/pings":
             # Endpoint for LogOutput to get the current count
             counter = get_counter()
@@ -106,6 +154,12 @@ class PingPongHandler(BaseHTTPRequestHandler):
             self.send_header("Content-Type", "text/plain")
             self.end_headers()
             self.wfile.write(str(counter).encode())
+        elif self.path == "/metrics":
+            # Prometheus scrape endpoint
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.end_headers()
+            self.wfile.write(metrics.render().encode())
         else:
             self.send_response(404)
             self.end_headers()
@@ -116,6 +170,7 @@ class PingPongHandler(BaseHTTPRequestHandler):
 
 if __name__ == "__main__":
     init_db()
+    health_checker.start()
     port = int(os.getenv("PORT", 3000))
     print(f"Server started in port {port}")
     server = HTTPServer(("0.0.0.0", port), PingPongHandler)
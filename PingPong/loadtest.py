@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Load-test harness for the PingPong services.
+
+Starts each server variant locally against a scratch Postgres database, drives
+/pingpong and /pings at the given concurrency and prints req/s and latency
+percentiles per variant, counter strategy and endpoint:
+
+    DB_HOST=localhost python loadtest.py
+    DB_HOST=localhost python loadtest.py --variants fastapi --strategies single,sharded --concurrency 50
+    python loadtest.py --stand-in --duration 5 --json results.json
+
+The usual DB_* variables select the Postgres server. The harness recreates the
+--database scratch database before every run, so the user needs CREATEDB. With
+--stand-in, or when that server cannot be reached, a throwaway Postgres is
+started with the pgserver package (pip install pgserver) instead.
+
+Counter strategies only apply to the FastAPI variant; gke and Knative always
+run their single-row counter.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = {
+    "fastapi": os.path.join(ROOT, "PingPong", "main.py"),
+    "gke": os.path.join(ROOT, "PingPong", "gke", "main.py"),
+    "knative": os.path.join(ROOT, "Chapter6", "5.7-Knative-PingPong", "main.py"),
+}
+
+# Environment for each COUNTER_MODE / buffering combination of PingPong/main.py
+STRATEGIES = {
+    "single": {"COUNTER_MODE": "single"},
+    "sharded": {"COUNTER_MODE": "sharded"},
+    "gcounter": {"COUNTER_MODE": "gcounter", "REPLICA_ID": "loadtest"},
+    "write-behind": {"COUNTER_MODE": "single", "COUNTER_WRITE_BEHIND": "true"},
+    "cache": {"COUNTER_MODE": "single", "COUNTER_CACHE": "true"},
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def db_settings(args):
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432"),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", ""),
+        "admin_db": os.getenv("DB_ADMIN_NAME", "postgres"),
+        "database": args.database,
+    }
+
+
+def can_connect(settings):
+    try:
+        psycopg2.connect(host=settings["host"], port=settings["port"], dbname=settings["admin_db"],
+                         user=settings["user"], password=settings["password"], connect_timeout=3).close()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def start_stand_in(settings):
+    """Start a throwaway Postgres and point settings at its socket"""
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("No Postgres reachable and pgserver is not installed (pip install pgserver)")
+    pgdata = tempfile.mkdtemp(prefix="pingpong-loadtest-")
+    server = pgserver.get_server(pgdata, cleanup_mode="delete")
+    # pgserver listens on a Unix socket inside its data directory
+    settings.update(host=pgdata, port="5432", user="postgres", password="", admin_db="postgres")
+    print(f"Using stand-in Postgres in {pgdata}", flush=True)
+    return server
+
+
+def reset_database(settings):
+    conn = psycopg2.connect(host=settings["host"], port=settings["port"], dbname=settings["admin_db"],
+                            user=settings["user"], password=settings["password"])
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(f'DROP DATABASE IF EXISTS "{settings["database"]}"')
+    cur.execute(f'CREATE DATABASE "{settings["database"]}"')
+    cur.close()
+    conn.close()
+
+
+def start_server(main_py, port, settings, extra_env):
+    # Every variant imports PingPong/observability.py, which the images copy in next to main.py
+    env = dict(os.environ, PORT=str(port), DB_HOST=settings["host"], DB_PORT=str(settings["port"]),
+               DB_NAME=settings["database"], DB_USER=settings["user"], DB_PASSWORD=settings["password"],
+               PYTHONPATH=os.path.join(ROOT, "PingPong"))
+    env.update(extra_env)
+    return subprocess.Popen([sys.executable, "-u", main_py], env=env, cwd=os.path.dirname(main_py),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read()
+            return True
+        except Exception:
+            time.sleep(0.1)
+    return False
+
+
+def run_load(base_url, concurrency, duration, read_ratio, timeout=10):
+    """Send a /pingpong and /pings mix from `concurrency` threads and collect latencies per path"""
+    paths = ("/pingpong", "/pings")
+    latencies = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        local_latencies = {path: [] for path in paths}
+        local_errors = {path: 0 for path in paths}
+        while time.monotonic() < deadline:
+            path = "/pings" if random.random() < read_ratio else "/pingpong"
+            started = time.monotonic()
+            try:
+                with urllib.request.urlopen(base_url + path, timeout=timeout) as response:
+                    response.read()
+                local_latencies[path].append(time.monotonic() - started)
+            except Exception:
+                local_errors[path] += 1
+        with lock:
+            for path in paths:
+                latencies[path].extend(local_latencies[path])
+                errors[path] += local_errors[path]
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    results = {}
+    for path in paths:
+        values = sorted(latencies[path])
+        results[path] = {
+            "requests": len(values),
+            "errors": errors[path],
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    return results
+
+
+def print_result(label, path, result):
+    print(f"{label:<22} {path:<10} {result['rps']:>10.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+          f"{result['p99_ms']:>9.2f} {result['requests']:>9} {result['errors']:>7}", flush=True)
+
+
+def planned_runs(variants, strategies):
+    for variant in variants:
+        if variant == "fastapi":
+            for strategy in strategies:
+                yield variant, strategy, STRATEGIES[strategy]
+        else:
+            yield variant, "single", {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PingPong variants and counter strategies")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="Comma-separated subset of " + ",".join(VARIANTS))
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="Comma-separated subset of " + ",".join(STRATEGIES))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--read-ratio", type=float, default=0.2, help="Fraction of requests sent to /pings")
+    parser.add_argument("--port", type=int, default=18090)
+    parser.add_argument("--database", default="pingpong_loadtest", help="Scratch database, recreated for every run")
+    parser.add_argument("--stand-in", action="store_true", help="Always use a throwaway pgserver Postgres")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    variants = [v for v in args.variants.split(",") if v]
+    strategies = [s for s in args.strategies.split(",") if s]
+    unknown = [v for v in variants if v not in VARIANTS] + [s for s in strategies if s not in STRATEGIES]
+    if unknown:
+        parser.error(f"unknown variant or strategy: {', '.join(unknown)}")
+
+    settings = db_settings(args)
+    stand_in = None
+    if args.stand_in or not can_connect(settings):
+        stand_in = start_stand_in(settings)
+
+    print(f"concurrency={args.concurrency} duration={args.duration}s read_ratio={args.read_ratio}", flush=True)
+    print(f"{'run':<22} {'path':<10} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'requests':>9} {'errors':>7}", flush=True)
+
+    report = []
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        for variant, strategy, extra_env in planned_runs(variants, strategies):
+            label = f"{variant}/{strategy}"
+            reset_database(settings)
+            server = start_server(VARIANTS[variant], args.port, settings, extra_env)
+            try:
+                if not wait_until_up(base_url + "/pings"):
+                    print(f"{label}: server did not start", flush=True)
+                    continue
+                run_load(base_url, args.concurrency, args.warmup, args.read_ratio)
+                results = run_load(base_url, args.concurrency, args.duration, args.read_ratio)
+                for path, result in results.items():
+                    print_result(label, path, result)
+                    report.append(dict(result, variant=variant, strategy=strategy, path=path))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        if stand_in is not None:
+            stand_in.cleanup()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"concurrency": args.concurrency, "duration": args.duration,
+                       "read_ratio": args.read_ratio, "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
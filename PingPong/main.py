@@ -1,10 +1,22 @@
-from fastapi import FastAPI
-from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, JSONResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
 import uvicorn
+import asyncio
+import json
 import os
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import random
+import select
+import threading
 import time
 from contextlib import contextmanager
+from observability import HealthChecker, Metrics
 
 app = FastAPI(title="Ping Pong App")
 
@@ -15,39 +27,286 @@ DB_NAME = os.getenv("DB_NAME", "pingpongdb")
 DB_USER = os.getenv("DB_USER", "pingponguser")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "pingpongpass")
 
+# Connection pool settings
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Seconds a caller waits for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Connections idle for longer than this are checked with SELECT 1 before reuse
+DB_POOL_CHECK_IDLE = float(os.getenv("DB_POOL_CHECK_IDLE", "30"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+# Counter storage: "single" keeps one row, "sharded" stripes increments over COUNTER_SHARDS rows,
+# "gcounter" counts in memory per replica and merges per-replica rows in the background
+COUNTER_MODE = os.getenv("COUNTER_MODE", "single").lower()
+COUNTER_SHARDS = max(1, int(os.getenv("COUNTER_SHARDS", "16")))
+# Shard selection in sharded mode: "random" per increment, or "worker" for a fixed shard per thread
+COUNTER_SHARD_STRATEGY = os.getenv("COUNTER_SHARD_STRATEGY", "random").lower()
+# G-counter mode: this replica's slot name and how often slots are merged. The slot name must survive
+# restarts (e.g. a StatefulSet pod name); a fresh name per pod would add a table row on every rollout.
+REPLICA_ID = os.getenv("REPLICA_ID", "")
+COUNTER_MERGE_INTERVAL_MS = int(os.getenv("COUNTER_MERGE_INTERVAL_MS", "1000"))
+
+# Write-behind mode: accumulate increments in memory and flush them in one UPDATE
+COUNTER_WRITE_BEHIND = os.getenv("COUNTER_WRITE_BEHIND", "false").lower() == "true"
+# Flush every COUNTER_FLUSH_INTERVAL_MS, or sooner once COUNTER_FLUSH_MAX_PENDING increments are pending
+COUNTER_FLUSH_INTERVAL_MS = int(os.getenv("COUNTER_FLUSH_INTERVAL_MS", "250"))
+COUNTER_FLUSH_MAX_PENDING = int(os.getenv("COUNTER_FLUSH_MAX_PENDING", "100"))
+
+# Read cache for /pings, kept current by LISTEN/NOTIFY and re-read after COUNTER_CACHE_TTL seconds without news
+COUNTER_CACHE = os.getenv("COUNTER_CACHE", "false").lower() == "true"
+COUNTER_CACHE_TTL = float(os.getenv("COUNTER_CACHE_TTL", "5"))
+
+# GET /pings/stream pushes counter changes to subscribers, coalesced to at most COUNTER_STREAM_MAX_RATE updates per second
+COUNTER_STREAM = os.getenv("COUNTER_STREAM", "false").lower() == "true"
+COUNTER_STREAM_MAX_RATE = float(os.getenv("COUNTER_STREAM_MAX_RATE", "4"))
+COUNTER_STREAM_KEEPALIVE = float(os.getenv("COUNTER_STREAM_KEEPALIVE", "15"))
+
+# Increments publish the new total on COUNTER_CHANNEL; on by default when the cache or stream is enabled
+COUNTER_NOTIFY = os.getenv("COUNTER_NOTIFY", str(COUNTER_CACHE or COUNTER_STREAM)).lower() == "true"
+COUNTER_CHANNEL = "pingpong_counter"
+
+# Upper bound on pings registered by a single POST /pingpong/batch
+PINGPONG_BATCH_MAX = int(os.getenv("PINGPONG_BATCH_MAX", "100000"))
+
+# Per-key counters (/pingpong?key=...) are buffered in memory and upserted every KEYED_FLUSH_INTERVAL_MS,
+# or sooner once KEYED_MAX_PENDING_KEYS distinct keys are waiting
+KEYED_FLUSH_INTERVAL_MS = int(os.getenv("KEYED_FLUSH_INTERVAL_MS", "1000"))
+KEYED_MAX_PENDING_KEYS = int(os.getenv("KEYED_MAX_PENDING_KEYS", "10000"))
+# Keys per upsert statement when flushing
+KEYED_UPSERT_CHUNK = 5000
+KEY_MAX_LENGTH = 200
+TOP_MAX = 1000
+
+# Pings are counted in per-second buckets in memory and written as per-minute and per-hour rollups
+# every RATE_FLUSH_INTERVAL seconds; minute rows older than RATE_MINUTE_RETENTION_DAYS are pruned
+RATE_FLUSH_INTERVAL = float(os.getenv("RATE_FLUSH_INTERVAL", "10"))
+RATE_MINUTE_RETENTION_DAYS = int(os.getenv("RATE_MINUTE_RETENTION_DAYS", "7"))
+# Longest range /pings/history serves per resolution
+RATE_MAX_RANGE = {"minute": timedelta(days=7), "hour": timedelta(days=366)}
+
+# /healthz answers from a background check run every HEALTH_CHECK_INTERVAL seconds,
+# and reports unready once the last check is older than HEALTH_MAX_AGE
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))
+HEALTH_MAX_AGE = float(os.getenv("HEALTH_MAX_AGE", "15"))
+
+
+metrics = Metrics()
+metrics.describe("pingpong_http_requests_total", "counter", "HTTP requests by endpoint, method and status")
+metrics.describe("pingpong_http_request_duration_seconds", "histogram", "HTTP request latency by endpoint")
+metrics.describe("pingpong_db_phase_duration_seconds", "histogram", "Database time by phase (checkout, connect, query, commit)")
+metrics.describe("pingpong_db_connect_retries_total", "counter", "Retries in get_db_connection after a failed connection attempt")
+metrics.describe("pingpong_db_pool_connections", "gauge", "Pooled database connections by state")
+metrics.inc("pingpong_db_connect_retries_total", 0)
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor that records statement time as the "query" phase"""
+
+    def execute(self, query, vars=None):
+        with metrics.timer("pingpong_db_phase_duration_seconds", phase="query"):
+            return super().execute(query, vars)
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    """Connection that hands out TimedCursors and records commit time"""
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault("cursor_factory", TimedCursor)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        with metrics.timer("pingpong_db_phase_duration_seconds", phase="commit"):
+            return super().commit()
+
+
+def connect_db():
+    """Open a new database connection"""
+    with metrics.timer("pingpong_db_phase_duration_seconds", phase="connect"):
+        return psycopg2.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            connect_timeout=DB_CONNECT_TIMEOUT,
+            connection_factory=TimedConnection
+        )
+
+
+class ConnectionPool:
+    """Thread-safe Postgres connection pool with health-checked checkout and usage statistics"""
+
+    def __init__(self, minconn, maxconn, timeout, check_idle):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._lock = threading.Lock()
+        # Bounds open connections; callers queue here when the pool is exhausted
+        self._slots = threading.BoundedSemaphore(maxconn)
+        # Idle connections as (conn, last_used) pairs, reused most-recent first
+        self._idle = []
+        self._in_use = 0
+        self._stats = {
+            "created": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "wait_seconds": 0.0,
+            "health_checks": 0,
+            "discarded": 0,
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _connect(self):
+        conn = connect_db()
+        self._count("created")
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self._count("discarded")
+
+    def _is_healthy(self, conn, last_used):
+        """Check an idle connection before handing it out"""
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.check_idle:
+            return True
+        self._count("health_checks")
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def prefill(self):
+        """Open connections until `minconn` are available"""
+        with self._lock:
+            missing = self.minconn - len(self._idle) - self._in_use
+        for _ in range(missing):
+            conn = self._connect()
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+
+    def getconn(self):
+        """Check out a healthy connection, waiting up to `timeout` seconds for a free slot"""
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            self._count("waits")
+            if not self._slots.acquire(timeout=self.timeout):
+                self._count("timeouts")
+                raise psycopg2.pool.PoolError(f"No database connection available after {self.timeout}s")
+            self._count("wait_seconds", time.monotonic() - started)
+        try:
+            while True:
+                with self._lock:
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    conn = self._connect()
+                    break
+                conn, last_used = item
+                if self._is_healthy(conn, last_used):
+                    break
+                self._discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._in_use += 1
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, closing it if it is broken"""
+        try:
+            if not discard and not conn.closed:
+                try:
+                    if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+            if discard or conn.closed:
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        """Snapshot of pool configuration and usage counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "min": self.minconn,
+                "max": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+            })
+        stats["wait_seconds"] = round(stats["wait_seconds"], 6)
+        return stats
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+
+db_pool = ConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_CHECK_IDLE)
+
 
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections"""
+    """Context manager that checks a connection out of the pool"""
     max_retries = 10
     retry_delay = 2
-    
+
     for attempt in range(max_retries):
         try:
-            conn = psycopg2.connect(
-                host=DB_HOST,
-                port=DB_PORT,
-                database=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD
-            )
-            yield conn
-            conn.close()
-            return
+            with metrics.timer("pingpong_db_phase_duration_seconds", phase="checkout"):
+                conn = db_pool.getconn()
+            break
         except psycopg2.OperationalError as e:
             if attempt < max_retries - 1:
+                metrics.inc("pingpong_db_connect_retries_total")
                 print(f"Database connection failed (attempt {attempt + 1}/{max_retries}): {e}. Retrying...", flush=True)
                 time.sleep(retry_delay)
             else:
                 print(f"Database connection failed after {max_retries} attempts: {e}", flush=True)
                 raise
 
+    discard = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        discard = True
+        raise
+    finally:
+        db_pool.putconn(conn, discard=discard)
+
 
 def init_database():
     """Initialize database table if it doesn't exist"""
     try:
         with get_db_connection() as conn:
             cur = conn.cursor()
+            # Replicas starting together would otherwise race on CREATE TABLE IF NOT EXISTS
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('pingpong_init'));")
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS pingpong_counter (
                     id SERIAL PRIMARY KEY,
@@ -59,90 +318,1038 @@ def init_database():
             cur.execute("SELECT COUNT(*) FROM pingpong_counter;")
             if cur.fetchone()[0] == 0:
                 cur.execute("INSERT INTO pingpong_counter (counter) VALUES (0);")
+            if COUNTER_MODE == "sharded":
+                init_counter_shards(cur)
+            elif COUNTER_MODE == "gcounter":
+                init_gcounter(cur)
+            init_keyed_counters(cur)
+            init_rollups(cur)
             conn.commit()
             cur.close()
-            print("Database initialized successfully", flush=True)
+        db_pool.prefill()
+        print(f"Database initialized successfully (counter mode: {COUNTER_MODE})", flush=True)
     except Exception as e:
         print(f"Error initializing database: {e}", flush=True)
 
 
+def init_counter_shards(cur):
+    """Create the shard table, migrating the single-row counter into shard 0 on first use"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS pingpong_counter_shards (
+            shard INTEGER PRIMARY KEY,
+            counter BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    # Serialize concurrent replicas starting up so the migration runs exactly once
+    cur.execute("LOCK TABLE pingpong_counter_shards IN EXCLUSIVE MODE;")
+    cur.execute("SELECT COUNT(*) FROM pingpong_counter_shards;")
+    if cur.fetchone()[0] == 0:
+        cur.execute("""
+            INSERT INTO pingpong_counter_shards (shard, counter)
+            SELECT 0, COALESCE((SELECT counter FROM pingpong_counter ORDER BY id DESC LIMIT 1), 0);
+        """)
+        print("Migrated pingpong_counter into pingpong_counter_shards", flush=True)
+    # Shards beyond COUNTER_SHARDS (after scaling down) are kept and still summed
+    cur.execute("""
+        INSERT INTO pingpong_counter_shards (shard, counter)
+        SELECT generate_series(0, %s - 1), 0
+        ON CONFLICT (shard) DO NOTHING;
+    """, (COUNTER_SHARDS,))
+
+
+def init_keyed_counters(cur):
+    """Create the per-key counter table"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS pingpong_keyed_counter (
+            key TEXT PRIMARY KEY,
+            counter BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    # Serves top-N queries without sorting every key
+    cur.execute("CREATE INDEX IF NOT EXISTS pingpong_keyed_counter_counter_idx ON pingpong_keyed_counter (counter DESC);")
+
+
+def init_rollups(cur):
+    """Create the ping rate rollup table"""
+    # The primary key doubles as the index for range queries within one resolution
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS pingpong_rollups (
+            resolution TEXT NOT NULL,
+            bucket TIMESTAMPTZ NOT NULL,
+            count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (resolution, bucket)
+        );
+    """)
+
+
+def init_gcounter(cur):
+    """Create the per-replica G-counter table, seeding it from the single-row counter on first use"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS pingpong_gcounter (
+            replica TEXT PRIMARY KEY,
+            counter BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute("LOCK TABLE pingpong_gcounter IN EXCLUSIVE MODE;")
+    cur.execute("SELECT COUNT(*) FROM pingpong_gcounter;")
+    if cur.fetchone()[0] == 0:
+        # The pre-existing total becomes a slot of its own that no replica writes to again
+        cur.execute("""
+            INSERT INTO pingpong_gcounter (replica, counter)
+            SELECT 'legacy', COALESCE((SELECT counter FROM pingpong_counter ORDER BY id DESC LIMIT 1), 0);
+        """)
+        print("Migrated pingpong_counter into pingpong_gcounter", flush=True)
+
+
+_worker = threading.local()
+
+
+def pick_shard():
+    """Choose the shard the next increment goes to"""
+    if COUNTER_SHARD_STRATEGY == "worker":
+        if not hasattr(_worker, "shard"):
+            _worker.shard = random.randrange(COUNTER_SHARDS)
+        return _worker.shard
+    return random.randrange(COUNTER_SHARDS)
+
+
 def get_counter():
-    """Get current counter from database"""
-    try:
-        with get_db_connection() as conn:
-            cur = conn.cursor()
+    """Get current counter, from the read cache when enabled"""
+    if gcounter is not None:
+        return gcounter.value()
+    if COUNTER_CACHE:
+        count = counter_cache.get()
+    else:
+        try:
+            count = read_counter()
+        except psycopg2.pool.PoolError:
+            raise
+        except Exception as e:
+            print(f"Error getting counter: {e}", flush=True)
+            return 0
+    if write_behind is not None:
+        count += write_behind.pending
+    return count
+
+
+def read_counter():
+    """Read current counter from database"""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        if COUNTER_MODE == "sharded":
+            cur.execute("SELECT COALESCE(SUM(counter), 0) FROM pingpong_counter_shards;")
+        else:
             cur.execute("SELECT counter FROM pingpong_counter ORDER BY id DESC LIMIT 1;")
-            result = cur.fetchone()
-            cur.close()
-            return result[0] if result else 0
-    except Exception as e:
-        print(f"Error getting counter: {e}", flush=True)
-        return 0
+        result = cur.fetchone()
+        cur.close()
+        return int(result[0]) if result else 0
 
 
 def increment_counter():
     """Increment counter in database and return new value"""
     try:
+        return add_pings(1)
+    except psycopg2.pool.PoolError:
+        # Surfaced as 503 so saturation is visible rather than a silently dropped ping
+        raise
+    except Exception as e:
+        print(f"Error incrementing counter: {e}", flush=True)
+        return 0
+
+
+def add_pings(count):
+    """Register `count` pings in one transaction and return the new total"""
+    if gcounter is not None:
+        new_count = gcounter.add(count)
+    elif write_behind is not None:
+        new_count = write_behind.add(count)
+    else:
         with get_db_connection() as conn:
             cur = conn.cursor()
-            # Get current counter
-            cur.execute("SELECT counter FROM pingpong_counter ORDER BY id DESC LIMIT 1 FOR UPDATE;")
-            result = cur.fetchone()
-            current_count = result[0] if result else 0
-            
-            # Increment and update
-            new_count = current_count + 1
-            cur.execute("UPDATE pingpong_counter SET counter = %s, updated_at = CURRENT_TIMESTAMP WHERE id = (SELECT id FROM pingpong_counter ORDER BY id DESC LIMIT 1);", (new_count,))
+            new_count = add_to_counter(cur, count)
             conn.commit()
             cur.close()
-            return new_count
-    except Exception as e:
-        print(f"Error incrementing counter: {e}", flush=True)
-        return 0
+    ping_rates.add(count)
+    return new_count
+
+
+def add_to_counter(cur, delta):
+    """Add delta to the stored counter and return the new total"""
+    if COUNTER_MODE == "sharded":
+        total = increment_shard(cur, pick_shard(), delta)
+    else:
+        cur.execute("""
+            UPDATE pingpong_counter
+            SET counter = counter + %s, updated_at = CURRENT_TIMESTAMP
+            WHERE id = (SELECT id FROM pingpong_counter ORDER BY id DESC LIMIT 1)
+            RETURNING counter;
+        """, (delta,))
+        result = cur.fetchone()
+        total = result[0] if result else 0
+    if COUNTER_NOTIFY:
+        # Postgres only delivers the notification if the caller's transaction commits
+        cur.execute("SELECT pg_notify(%s, %s);", (COUNTER_CHANNEL, str(total)))
+    return total
+
+
+def increment_shard(cur, shard, delta=1):
+    """Bump one shard row and return the total across all shards"""
+    # The outer SELECT cannot see the CTE's update, so add the bumped shard to the sum of the others
+    cur.execute("""
+        WITH bumped AS (
+            UPDATE pingpong_counter_shards
+            SET counter = counter + %s, updated_at = CURRENT_TIMESTAMP
+            WHERE shard = %s
+            RETURNING counter
+        )
+        SELECT (SELECT counter FROM bumped)
+             + COALESCE((SELECT SUM(counter) FROM pingpong_counter_shards WHERE shard <> %s), 0);
+    """, (delta, shard, shard))
+    return int(cur.fetchone()[0])
+
+
+class WriteBehindCounter:
+    """Accumulates increments in memory and flushes them to Postgres in a single UPDATE"""
+
+    def __init__(self, interval_ms, max_pending):
+        self.interval_ms = interval_ms
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pending = 0
+        # Delta taken by a flush that has not committed yet
+        self._inflight = 0
+        # Total as of the last flush; other replicas' increments show up on the next flush
+        self._flushed_total = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.last_flush_at = None
+        self.last_flush_delta = 0
+
+    @property
+    def pending(self):
+        """Increments not yet committed to the database"""
+        with self._lock:
+            return self._pending + self._inflight
+
+    def start(self, initial_total):
+        self._flushed_total = initial_total
+        self._thread = threading.Thread(target=self._run, name="counter-flusher", daemon=True)
+        self._thread.start()
+
+    def add(self, delta):
+        """Record increments locally and return the counter value this replica reports"""
+        with self._lock:
+            self._pending += delta
+            value = self._flushed_total + self._inflight + self._pending
+            if self._pending >= self.max_pending:
+                self._wakeup.set()
+        return value
+
+    def flush(self):
+        """Write the pending delta to the database in one statement"""
+        with self._lock:
+            delta, self._pending = self._pending, 0
+            self._inflight = delta
+        if delta == 0:
+            return
+        try:
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                total = add_to_counter(cur, delta)
+                conn.commit()
+                cur.close()
+        except Exception as e:
+            # Put the delta back so the next flush retries it
+            with self._lock:
+                self._pending += delta
+                self._inflight = 0
+                self.flush_errors += 1
+            print(f"Error flushing {delta} pending increments: {e}", flush=True)
+            return
+        with self._lock:
+            self._flushed_total = total
+            self._inflight = 0
+            self.flushes += 1
+            self.last_flush_at = time.time()
+            self.last_flush_delta = delta
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval_ms / 1000)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self):
+        """Stop the flusher thread and write out whatever is still pending"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "flush_interval_ms": self.interval_ms,
+                "flush_max_pending": self.max_pending,
+                "pending": self._pending + self._inflight,
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+                "last_flush_at": self.last_flush_at,
+                "last_flush_delta": self.last_flush_delta,
+            }
+
+
+class CounterCache:
+    """In-process counter value kept current by LISTEN/NOTIFY, re-read from the database once stale"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Only one request re-reads the database when the value goes stale
+        self._refresh_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._value = None
+        self._updated_at = 0.0
+        self.listening = False
+        self.hits = 0
+        self.misses = 0
+        self.notifications = 0
+        # Called with the new value, from the listener thread, whenever the counter grows
+        self.on_change = []
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, name="counter-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _fresh_value(self):
+        if self._value is not None and time.monotonic() - self._updated_at < self.ttl:
+            return self._value
+        return None
+
+    def update(self, value):
+        """Store a newer counter value"""
+        with self._lock:
+            # The counter only grows, so out-of-order notifications never move it backwards
+            changed = self._value is None or value > self._value
+            if changed:
+                self._value = value
+            self._updated_at = time.monotonic()
+        if changed:
+            for callback in self.on_change:
+                callback(value)
+
+    def get(self):
+        """Return the cached value, re-reading the database if it is older than the TTL"""
+        with self._lock:
+            value = self._fresh_value()
+            if value is not None:
+                self.hits += 1
+                return value
+        with self._refresh_lock:
+            with self._lock:
+                value = self._fresh_value()
+                if value is not None:
+                    self.hits += 1
+                    return value
+                self.misses += 1
+            try:
+                self.update(read_counter())
+            except Exception as e:
+                print(f"Error refreshing cached counter: {e}", flush=True)
+            with self._lock:
+                return self._value if self._value is not None else 0
+
+    def _listen(self):
+        """Apply counter notifications, reconnecting whenever the listen connection drops"""
+        while not self._stopped.is_set():
+            conn = None
+            try:
+                conn = connect_db()
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {COUNTER_CHANNEL};")
+                cur.close()
+                self.listening = True
+                print(f"Listening for counter updates on channel {COUNTER_CHANNEL}", flush=True)
+                while not self._stopped.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        with self._lock:
+                            self.notifications += 1
+                        self.update(int(notify.payload))
+            except Exception as e:
+                print(f"Counter listener error: {e}. Reconnecting...", flush=True)
+            finally:
+                self.listening = False
+                if conn is not None:
+                    conn.close()
+            self._stopped.wait(2)
+
+    def stats(self):
+        with self._lock:
+            age = time.monotonic() - self._updated_at if self._value is not None else None
+            return {
+                "ttl_seconds": self.ttl,
+                "value": self._value,
+                "age_seconds": round(age, 6) if age is not None else None,
+                "listening": self.listening,
+                "hits": self.hits,
+                "misses": self.misses,
+                "notifications": self.notifications,
+            }
+
+
+class CounterBroadcaster:
+    """Fans counter changes out to stream subscribers from one coalescing task"""
+
+    def __init__(self, max_rate):
+        self.min_interval = 1 / max_rate if max_rate > 0 else 0
+        self._subscribers = set()
+        self._loop = None
+        self._changed = None
+        self._task = None
+        self._latest = None
+        self.published = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def publish(self, value):
+        """Record a new value; safe to call from any thread"""
+        self._loop.call_soon_threadsafe(self._set_latest, value)
+
+    def _set_latest(self, value):
+        self._latest = value
+        self._changed.set()
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            value = self._latest
+            for queue in list(self._subscribers):
+                # Subscribers only need the newest value, so drop one they have not read yet
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(value)
+            self.published += 1
+            # Changes arriving while we sleep collapse into the next publish
+            await asyncio.sleep(self.min_interval)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def stats(self):
+        return {
+            "max_rate": COUNTER_STREAM_MAX_RATE,
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+        }
+
+
+class GCounter:
+    """Grow-only CRDT counter: each replica increments its own slot and merges slots through Postgres"""
+
+    def __init__(self, replica_id, interval_ms):
+        self.replica_id = replica_id
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        # Highest value seen per other replica; merging takes the per-slot maximum, so merges commute
+        self._slots = {}
+        # This replica's slot is its persisted value (None until loaded) plus the increments since startup,
+        # so increments taken before the slot loads are added to it rather than lost to GREATEST
+        self._base = None
+        self._delta = 0
+        self._written = None
+        self.merges = 0
+        self.merge_errors = 0
+        self.last_merge_at = None
+
+    def start(self):
+        if not self.merge():
+            raise RuntimeError("Could not load this replica's G-counter slot")
+        self._thread = threading.Thread(target=self._run, name="gcounter-merger", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop merging in the background and publish this replica's final slot value"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.merge()
+
+    def _total(self):
+        return sum(self._slots.values()) + (self._base or 0) + self._delta
+
+    def add(self, delta):
+        """Count locally without touching the database and return the merged total"""
+        with self._lock:
+            self._delta += delta
+            return self._total()
+
+    def value(self):
+        with self._lock:
+            return self._total()
+
+    def merge(self):
+        """Publish this replica's slot and pull in every other replica's; returns whether it succeeded"""
+        with self._lock:
+            base, delta = self._base, self._delta
+        try:
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                if base is None:
+                    # A restarted replica resumes from its persisted slot
+                    cur.execute("SELECT counter FROM pingpong_gcounter WHERE replica = %s;", (self.replica_id,))
+                    row = cur.fetchone()
+                    base = int(row[0]) if row else 0
+                own = base + delta
+                if own != self._written:
+                    cur.execute("""
+                        INSERT INTO pingpong_gcounter (replica, counter) VALUES (%s, %s)
+                        ON CONFLICT (replica) DO UPDATE
+                        SET counter = GREATEST(pingpong_gcounter.counter, EXCLUDED.counter),
+                            updated_at = CURRENT_TIMESTAMP;
+                    """, (self.replica_id, own))
+                cur.execute("SELECT replica, counter FROM pingpong_gcounter;")
+                rows = cur.fetchall()
+                conn.commit()
+                cur.close()
+        except Exception as e:
+            with self._lock:
+                self.merge_errors += 1
+            print(f"Error merging G-counter slots: {e}", flush=True)
+            return False
+        with self._lock:
+            self._base = base
+            for replica, counter in rows:
+                if replica != self.replica_id:
+                    self._slots[replica] = max(self._slots.get(replica, 0), int(counter))
+            self._written = max(own, self._written or 0)
+            self.merges += 1
+            self.last_merge_at = time.time()
+        return True
+
+    def _run(self):
+        while not self._stopped.wait(self.interval_ms / 1000):
+            self.merge()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "replica_id": self.replica_id,
+                "merge_interval_ms": self.interval_ms,
+                "local": (self._base or 0) + self._delta,
+                "replicas": len(self._slots) + 1,
+                "merges": self.merges,
+                "merge_errors": self.merge_errors,
+                "last_merge_at": self.last_merge_at,
+            }
+
+
+class KeyedCounter:
+    """Buffers per-key increments and writes them with batched upserts"""
+
+    def __init__(self, interval_ms, max_pending_keys):
+        self.interval_ms = interval_ms
+        self.max_pending_keys = max_pending_keys
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pending = {}
+        self.flushes = 0
+        self.flush_errors = 0
+        self.keys_written = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="keyed-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def add(self, key, delta=1):
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + delta
+            if len(self._pending) >= self.max_pending_keys:
+                self._wakeup.set()
+
+    def pending(self, key):
+        with self._lock:
+            return self._pending.get(key, 0)
+
+    def flush(self):
+        """Upsert all pending deltas, one statement per chunk of keys"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        # Sorted keys make concurrent flushes from different replicas lock rows in the same order
+        keys = sorted(pending)
+        try:
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                for start in range(0, len(keys), KEYED_UPSERT_CHUNK):
+                    chunk = keys[start:start + KEYED_UPSERT_CHUNK]
+                    cur.execute("""
+                        INSERT INTO pingpong_keyed_counter (key, counter)
+                        SELECT * FROM unnest(%s::text[], %s::bigint[])
+                        ON CONFLICT (key) DO UPDATE
+                        SET counter = pingpong_keyed_counter.counter + EXCLUDED.counter,
+                            updated_at = CURRENT_TIMESTAMP;
+                    """, (chunk, [pending[key] for key in chunk]))
+                conn.commit()
+                cur.close()
+        except Exception as e:
+            # Merge the deltas back so the next flush retries them
+            with self._lock:
+                for key, delta in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + delta
+                self.flush_errors += 1
+            print(f"Error flushing {len(pending)} keyed counters: {e}", flush=True)
+            return
+        with self._lock:
+            self.flushes += 1
+            self.keys_written += len(keys)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval_ms / 1000)
+            self._wakeup.clear()
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "flush_interval_ms": self.interval_ms,
+                "pending_keys": len(self._pending),
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+                "keys_written": self.keys_written,
+            }
+
+
+def get_key_count(key):
+    """Return one key's count, including increments not yet flushed"""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT counter FROM pingpong_keyed_counter WHERE key = %s;", (key,))
+        result = cur.fetchone()
+        cur.close()
+    return (int(result[0]) if result else 0) + keyed_counter.pending(key)
+
+
+def get_top_keys(limit):
+    """Return the keys with the most flushed pings"""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT key, counter FROM pingpong_keyed_counter ORDER BY counter DESC LIMIT %s;", (limit,))
+        rows = cur.fetchall()
+        cur.close()
+    return [{"key": key, "count": int(counter)} for key, counter in rows]
+
+
+keyed_counter = KeyedCounter(KEYED_FLUSH_INTERVAL_MS, KEYED_MAX_PENDING_KEYS)
+
+
+class PingRates:
+    """Counts pings per second in memory and flushes them as minute and hour rollups"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._seconds = {}
+        self._last_prune = 0.0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="rate-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush(final=True)
+
+    def add(self, count):
+        second = int(time.time())
+        with self._lock:
+            self._seconds[second] = self._seconds.get(second, 0) + count
+
+    def flush(self, final=False):
+        """Fold finished seconds into minute and hour deltas and upsert them"""
+        now = int(time.time())
+        with self._lock:
+            # The current second is still filling up, so leave it for the next flush unless shutting down
+            done = {second: count for second, count in self._seconds.items() if final or second < now}
+            for second in done:
+                del self._seconds[second]
+        if not done:
+            return
+        rows = {}
+        for second, count in done.items():
+            for resolution, width in (("minute", 60), ("hour", 3600)):
+                bucket = (resolution, second - second % width)
+                rows[bucket] = rows.get(bucket, 0) + count
+        keys = sorted(rows)
+        try:
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("""
+                    INSERT INTO pingpong_rollups (resolution, bucket, count)
+                    SELECT resolution, to_timestamp(epoch), count
+                    FROM unnest(%s::text[], %s::bigint[], %s::bigint[]) AS r(resolution, epoch, count)
+                    ON CONFLICT (resolution, bucket) DO UPDATE
+                    SET count = pingpong_rollups.count + EXCLUDED.count;
+                """, ([k[0] for k in keys], [k[1] for k in keys], [rows[k] for k in keys]))
+                if time.time() - self._last_prune >= 3600:
+                    cur.execute(
+                        "DELETE FROM pingpong_rollups WHERE resolution = 'minute' AND bucket < now() - %s * interval '1 day';",
+                        (RATE_MINUTE_RETENTION_DAYS,),
+                    )
+                    self._last_prune = time.time()
+                conn.commit()
+                cur.close()
+        except Exception as e:
+            # Put the seconds back so the next flush retries them
+            with self._lock:
+                for second, count in done.items():
+                    self._seconds[second] = self._seconds.get(second, 0) + count
+                self.flush_errors += 1
+            print(f"Error flushing ping rollups: {e}", flush=True)
+            return
+        with self._lock:
+            self.flushes += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "flush_interval": self.interval,
+                "pending_seconds": len(self._seconds),
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+            }
+
+
+def get_rollups(resolution, start, end):
+    """Return rollup buckets of one resolution with start <= bucket < end"""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT bucket, count FROM pingpong_rollups
+            WHERE resolution = %s AND bucket >= %s AND bucket < %s
+            ORDER BY bucket;
+        """, (resolution, start, end))
+        rows = cur.fetchall()
+        cur.close()
+    return [{"t": bucket.astimezone(timezone.utc).isoformat(), "count": int(count)} for bucket, count in rows]
+
+
+ping_rates = PingRates(RATE_FLUSH_INTERVAL)
+
+# In G-counter mode increments never reach the shared counter row, so write-behind and the cache do not apply
+gcounter = GCounter(REPLICA_ID, COUNTER_MERGE_INTERVAL_MS) if COUNTER_MODE == "gcounter" else None
+write_behind = WriteBehindCounter(COUNTER_FLUSH_INTERVAL_MS, COUNTER_FLUSH_MAX_PENDING) if COUNTER_WRITE_BEHIND and gcounter is None else None
+# The stream is fed by the cache's LISTEN connection, so streaming also starts the listener
+counter_cache = CounterCache(COUNTER_CACHE_TTL) if (COUNTER_CACHE or COUNTER_STREAM) and gcounter is None else None
+broadcaster = CounterBroadcaster(COUNTER_STREAM_MAX_RATE) if COUNTER_STREAM and counter_cache is not None else None
+
+
+def check_database():
+    """Run SELECT 1 on a pooled connection"""
+    conn = db_pool.getconn()
+    discard = False
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1;")
+        cur.close()
+    except psycopg2.Error:
+        discard = True
+        raise
+    finally:
+        db_pool.putconn(conn, discard=discard)
+
+
+health_checker = HealthChecker(check_database, HEALTH_CHECK_INTERVAL, HEALTH_MAX_AGE)
 
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
     """Initialize database when app starts"""
+    if gcounter is not None and not REPLICA_ID:
+        raise RuntimeError("COUNTER_MODE=gcounter requires a stable REPLICA_ID, e.g. the StatefulSet pod name")
     print("Initializing database connection...", flush=True)
     init_database()
+    health_checker.start()
+    keyed_counter.start()
+    ping_rates.start()
+    if gcounter is not None:
+        gcounter.start()
+        print(f"G-counter mode enabled (replica {REPLICA_ID}, merge every {COUNTER_MERGE_INTERVAL_MS}ms)", flush=True)
+    if write_behind is not None:
+        write_behind.start(get_counter())
+        print(f"Write-behind counter enabled (flush every {COUNTER_FLUSH_INTERVAL_MS}ms or {COUNTER_FLUSH_MAX_PENDING} increments)", flush=True)
+    if broadcaster is not None:
+        broadcaster.start()
+        counter_cache.on_change.append(broadcaster.publish)
+    if counter_cache is not None:
+        counter_cache.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending increments and close pooled database connections"""
+    # uvicorn runs shutdown handlers on SIGTERM, so pending increments survive pod termination
+    keyed_counter.stop()
+    ping_rates.stop()
+    if gcounter is not None:
+        gcounter.stop()
+    if write_behind is not None:
+        write_behind.stop()
+    if counter_cache is not None:
+        counter_cache.stop()
+    if broadcaster is not None:
+        await broadcaster.stop()
+    health_checker.stop()
+    db_pool.close()
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and time them per route"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template so unmatched paths cannot blow up label cardinality
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        metrics.inc("pingpong_http_requests_total", endpoint=endpoint, method=request.method, status=status)
+        metrics.observe("pingpong_http_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+
+
+@app.exception_handler(psycopg2.pool.PoolError)
+async def pool_exhausted(request: Request, exc: psycopg2.pool.PoolError):
+    """Answer 503 when no pooled connection frees up within DB_POOL_TIMEOUT"""
+    return PlainTextResponse(str(exc), status_code=503, headers={"Retry-After": "1"})
 
 
 @app.get("/pingpong", response_class=PlainTextResponse)
-async def pingpong():
-    """Respond with pong and increment counter"""
-    counter = increment_counter()
+async def pingpong(key: Optional[str] = Query(None, min_length=1, max_length=KEY_MAX_LENGTH)):
+    """Respond with pong and increment counter, and the per-key counter when a key is given"""
+    if key is not None:
+        keyed_counter.add(key)
+    counter = await run_in_threadpool(increment_counter)
     return f"pong {counter}"
 
 
+class PingBatch(BaseModel):
+    count: Optional[int] = Field(None, ge=1, description="Number of pings to register")
+    events: Optional[List[dict]] = Field(None, description="Ping events, one per ping")
+
+
+@app.post("/pingpong/batch")
+async def pingpong_batch(batch: PingBatch):
+    """Register many pings with a single atomic database update"""
+    if (batch.count is None) == (batch.events is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'count' or 'events'")
+    count = batch.count if batch.count is not None else len(batch.events)
+    if count == 0:
+        raise HTTPException(status_code=400, detail="'events' must not be empty")
+    if count > PINGPONG_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {PINGPONG_BATCH_MAX} pings")
+    keys = {}
+    for event in batch.events or []:
+        key = event.get("key")
+        if key is None:
+            continue
+        if not isinstance(key, str) or not 0 < len(key) <= KEY_MAX_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Event keys must be strings of 1-{KEY_MAX_LENGTH} characters")
+        keys[key] = keys.get(key, 0) + 1
+    for key, delta in keys.items():
+        keyed_counter.add(key, delta)
+    try:
+        total = await run_in_threadpool(add_pings, count)
+    except psycopg2.pool.PoolError:
+        raise
+    except Exception as e:
+        print(f"Error registering batch of {count} pings: {e}", flush=True)
+        raise HTTPException(status_code=500, detail=f"Error registering pings: {str(e)}")
+    return JSONResponse(content={"added": count, "count": total})
+
+
 @app.get("/pings")
-async def get_pings():
-    """Return the current ping-pong count"""
-    counter = get_counter()
+async def get_pings(
+    key: Optional[str] = Query(None, min_length=1, max_length=KEY_MAX_LENGTH),
+    top: Optional[int] = Query(None, ge=1, le=TOP_MAX),
+):
+    """Return the current ping-pong count, one key's count, or the top keys"""
+    if key is not None:
+        try:
+            counter = await run_in_threadpool(get_key_count, key)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error reading key count: {str(e)}")
+        return JSONResponse(content={"key": key, "count": counter})
+    if top is not None:
+        try:
+            keys = await run_in_threadpool(get_top_keys, top)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error reading top keys: {str(e)}")
+        return JSONResponse(content={"top": keys})
+    counter = await run_in_threadpool(get_counter)
     return JSONResponse(content={"count": counter})
 
 
+@app.get("/pings/history")
+async def get_ping_history(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    resolution: str = Query("minute", pattern="^(minute|hour)$"),
+):
+    """Return ping counts per minute or hour between from and to (default: the last day)"""
+    # Timestamps without an offset are taken as UTC
+    if end is None:
+        end = datetime.now(timezone.utc)
+    elif end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start is None:
+        start = end - timedelta(days=1)
+    elif start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if end - start > RATE_MAX_RANGE[resolution]:
+        raise HTTPException(status_code=400, detail=f"Range exceeds {RATE_MAX_RANGE[resolution].days} days at {resolution} resolution")
+    try:
+        buckets = await run_in_threadpool(get_rollups, resolution, start, end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading ping history: {str(e)}")
+    return JSONResponse(content={
+        "resolution": resolution,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "buckets": buckets,
+    })
+
+
+@app.get("/pings/stream")
+async def stream_pings():
+    """Server-sent events stream of the ping-pong count, pushed when it changes"""
+    if broadcaster is None:
+        raise HTTPException(status_code=404, detail="Counter streaming is disabled (set COUNTER_STREAM=true)")
+    queue = broadcaster.subscribe()
+
+    async def events():
+        try:
+            counter = await run_in_threadpool(get_counter)
+            yield f"data: {json.dumps({'count': counter})}\n\n"
+            while True:
+                try:
+                    counter = await asyncio.wait_for(queue.get(), timeout=COUNTER_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Comment line keeps idle connections open through proxies
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps({'count': counter})}\n\n"
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/pool")
+async def pool_stats():
+    """Return connection pool statistics"""
+    return JSONResponse(content=db_pool.stats())
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics: request counts, latency histograms and database phase timings"""
+    pool = db_pool.stats()
+    metrics.set("pingpong_db_pool_connections", pool["in_use"], state="in_use")
+    metrics.set("pingpong_db_pool_connections", pool["idle"], state="idle")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/counter")
+async def counter_stats():
+    """Return counter storage mode, write-behind flush state and read cache state"""
+    content = {"mode": COUNTER_MODE, "write_behind": None, "cache": None}
+    if COUNTER_MODE == "sharded":
+        content["shards"] = COUNTER_SHARDS
+    if gcounter is not None:
+        content["gcounter"] = gcounter.stats()
+    content["keyed"] = keyed_counter.stats()
+    content["rates"] = ping_rates.stats()
+    if write_behind is not None:
+        content["write_behind"] = write_behind.stats()
+    if counter_cache is not None:
+        content["cache"] = counter_cache.stats()
+    if broadcaster is not None:
+        content["stream"] = broadcaster.stats()
+    return JSONResponse(content=content)
+
+
 @app.get("/")
 async def root():
     return {"message": "Ping Pong App - Use /pingpong endpoint"}
 
 @app.get("/healthz")
 async def healthz():
-    """Readiness probe: only ready when DB connection works."""
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            connect_timeout=2
-        )
-        conn.close()
-        return {"status": "ok"}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"status": "db unavailable", "error": str(e)})
+    """Readiness probe: only ready when the last background DB check passed and is fresh."""
+    healthy, details = health_checker.status()
+    return JSONResponse(status_code=200 if healthy else 500, content=details)
 
 
 if __name__ == "__main__":
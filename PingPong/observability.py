@@ -0,0 +1,185 @@
+"""
+Prometheus metrics registry and background health checker shared by the PingPong
+servers; each server passes in its own database check. PingPong/main.py imports it
+from this directory; the gke and Knative images copy it in from here (see their
+Dockerfiles).
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Metrics:
+    """Minimal Prometheus text-format registry of labelled counters and histograms"""
+
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text):
+        self._meta[name] = (kind, help_text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        """Set a gauge"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            buckets, total = self._histograms.get(key, ([0] * len(self.BUCKETS), [0.0, 0]))
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    buckets[i] += 1
+            total[0] += value
+            total[1] += 1
+            self._histograms[key] = (buckets, total)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def _labels(labels, extra=None):
+        pairs = list(labels) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: (list(b), list(t)) for k, (b, t) in self._histograms.items()}
+        lines = []
+        for name, (kind, help_text) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), (buckets, (total, count)) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(self.BUCKETS, buckets):
+                        lines.append(f"{name}_bucket{self._labels(labels, ('le', bound))} {bucket_count}")
+                    lines.append(f"{name}_bucket{self._labels(labels, ('le', '+Inf'))} {count}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {total}")
+                    lines.append(f"{name}_count{self._labels(labels)} {count}")
+            else:
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self._labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def connection_check(connect):
+    """Return a check that runs SELECT 1 on a connection kept open between checks"""
+    conn = None
+
+    def check():
+        nonlocal conn
+        try:
+            if conn is None or conn.closed:
+                conn = connect()
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+        except Exception:
+            if conn is not None:
+                conn.close()
+                conn = None
+            raise
+
+    return check
+
+
+class HealthChecker:
+    """Runs check() in the background so probes can answer from memory; check raises when unhealthy"""
+
+    def __init__(self, check, interval, max_age):
+        self._check = check
+        self.interval = interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._ok = False
+        self._error = "not checked yet"
+        # Wall-clock time for reporting, monotonic time for the age
+        self._checked_at = None
+        self._checked_mono = None
+        self._latency = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="health-checker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def check(self):
+        """Run the check once and record the outcome"""
+        started = time.monotonic()
+        try:
+            self._check()
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, str(e)
+        finished = time.monotonic()
+        with self._lock:
+            self._ok = ok
+            self._error = error
+            self._checked_at = time.time()
+            self._checked_mono = finished
+            self._latency = finished - started
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.check()
+            self._stopped.wait(self.interval)
+
+    def status(self):
+        """Return (healthy, details) from the last completed check"""
+        with self._lock:
+            age = time.monotonic() - self._checked_mono if self._checked_mono is not None else None
+            healthy = self._ok and age is not None and age <= self.max_age
+            error = self._error
+            if self._ok and not healthy:
+                error = f"last check is {age:.1f}s old"
+            return healthy, {
+                "status": "ok" if healthy else "db unavailable",
+                "error": error,
+                "checked_at": self._checked_at,
+                "age_seconds": round(age, 3) if age is not None else None,
+                "last_check_latency_ms": round(self._latency * 1000, 3) if self._latency is not None else None,
+            }
+
+    def status_text(self):
+        """Return (healthy, message) from the last completed check, for plain-text probes"""
+        with self._lock:
+            if self._checked_mono is None:
+                return False, self._error
+            age = time.monotonic() - self._checked_mono
+            details = f"last_check_latency_ms: {self._latency * 1000:.3f}\nage_seconds: {age:.3f}"
+            if not self._ok:
+                return False, f"Database connection failed: {self._error}\n{details}"
+            if age > self.max_age:
+                return False, f"Health check is stale\n{details}"
+            return True, f"ok\n{details}"